@@ -13,13 +13,21 @@
 
 import streamlit as st
 import math
+import re
+import numpy as np
 from io import BytesIO
 from datetime import datetime
+import matplotlib
+matplotlib.use('Agg')  # วาดรูปบนเซิร์ฟเวอร์ ไม่ต้องใช้ GUI backend
 import matplotlib.pyplot as plt
 import matplotlib.patches as patches
+from matplotlib.collections import PolyCollection
 from PIL import Image, ImageDraw
 import io
 import json
+from xml.sax.saxutils import escape
+from copy import deepcopy
+from functools import lru_cache
 import pandas as pd
 
 # ── docx imports ─────────────────────────────────────────────────────────────
@@ -28,12 +36,23 @@ try:
     from docx.shared import Inches, Pt, Cm
     from docx.enum.text import WD_ALIGN_PARAGRAPH
     from docx.enum.table import WD_TABLE_ALIGNMENT
-    from docx.oxml.ns import qn
-    from docx.oxml import OxmlElement
+    from docx.oxml.ns import qn, nsdecls
+    from docx.oxml import OxmlElement, parse_xml
+    from lxml import etree
+    # หน้า A4 และ margin (ซ้าย, ขวา, บน, ล่าง) ของรายงานฉบับเต็ม
+    PAGE_WIDTH, PAGE_HEIGHT = Cm(21.0), Cm(29.7)
+    PAGE_MARGINS = (Cm(2.5), Cm(2.5), Cm(2.5), Cm(2.0))
     DOCX_AVAILABLE = True
 except ImportError:
     DOCX_AVAILABLE = False
 
+# ── orjson (ถ้ามี) — serialize JSON ด้วย C, ถ้าไม่มีใช้ json มาตรฐาน ───────────
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 # ============================================================
 # ค่าคงที่และตารางอ้างอิง AASHTO 1993  (ไม่เปลี่ยน)
 # ============================================================
@@ -140,24 +159,29 @@ def draw_arrow_fixed(draw, start, end, color, width=4, arrow_size=15):
 # ฟังก์ชันสร้างรูปโครงสร้างชั้นทาง (ไม่เปลี่ยน)
 # ============================================================
 
-def create_pavement_structure_figure(layers_data, concrete_thickness_cm=None):
-    THAI_TO_ENG = {
-        "รองผิวทางคอนกรีตด้วย AC": "AC Interlayer", "รองผิวทางคอนกรีตด้วย PMA(AC)": "PMA Interlayer",
-        "หินคลุกปรับปรุงคุณภาพด้วยปูนซีเมนต์ (CTB)": "Cement Treated Base", "หินคลุกผสมซีเมนต์ UCS 24.5 ksc": "Mod.Crushed Rock ",
-        "หินคลุก CBR 80%": "Crushed Rock Base", "ดินซีเมนต์ UCS 17.5 ksc": "Soil Cement",
-        "วัสดุหมุนเวียน (Recycling)": "Recycled Material", "รองพื้นทางวัสดุมวลรวม CBR 25%": "Aggregate Subbase",
-        "วัสดุคัดเลือก ก": "Selected Material", "ดินถมคันทาง / ดินเดิม": "Subgrade",
-        "กำหนดเอง...": "Custom Material", "แผ่นคอนกรีต": "Concrete Slab", "Concrete Slab": "Concrete Slab",
-    }
-    LAYER_COLORS = {
-        "รองผิวทางคอนกรีตด้วย AC": "#2C3E50", "รองผิวทางคอนกรีตด้วย PMA(AC)": "#1A252F",
-        "หินคลุกปรับปรุงคุณภาพด้วยปูนซีเมนต์ (CTB)": "#7F8C8D", "หินคลุกผสมซีเมนต์ UCS 24.5 ksc": "#95A5A6",
-        "หินคลุก CBR 80%": "#BDC3C7", "ดินซีเมนต์ UCS 17.5 ksc": "#AAB7B8",
-        "วัสดุหมุนเวียน (Recycling)": "#85929E", "รองพื้นทางวัสดุมวลรวม CBR 25%": "#FFCC99",
-        "วัสดุคัดเลือก ก": "#E8DAEF", "ดินถมคันทาง / ดินเดิม": "#F5CBA7",
-        "กำหนดเอง...": "#FADBD8", "Concrete Slab": "#808080",
-    }
+# zlib ระดับ 3 แทนค่าเริ่มต้น 6 — ขนาดไฟล์ใกล้เคียงกันแต่เข้ารหัส PNG เร็วกว่ามาก
+PNG_PIL_KWARGS = {'compress_level': 3}
+# รูปที่ฝังในรายงาน Word แสดงกว้างไม่เกิน 5.5 นิ้ว — 100 dpi (กว้าง ~1200 px) คมพอสำหรับพิมพ์
+WORD_FIGURE_DPI = 100
+
+# ชื่อวัสดุ (ไทย) → (ชื่อภาษาอังกฤษ, สีของชั้น, พื้นเข้มหรือไม่) สำหรับรูปโครงสร้าง — ชั้นพื้นเข้มใช้ตัวเลขสีขาว
+LAYER_ATTRS = {
+    "รองผิวทางคอนกรีตด้วย AC":                  ("AC Interlayer",       "#2C3E50", True),
+    "รองผิวทางคอนกรีตด้วย PMA(AC)":             ("PMA Interlayer",      "#1A252F", True),
+    "หินคลุกปรับปรุงคุณภาพด้วยปูนซีเมนต์ (CTB)": ("Cement Treated Base", "#7F8C8D", True),
+    "หินคลุกผสมซีเมนต์ UCS 24.5 ksc":           ("Mod.Crushed Rock ",   "#95A5A6", True),
+    "หินคลุก CBR 80%":                          ("Crushed Rock Base",   "#BDC3C7", False),
+    "ดินซีเมนต์ UCS 17.5 ksc":                  ("Soil Cement",         "#AAB7B8", False),
+    "วัสดุหมุนเวียน (Recycling)":               ("Recycled Material",   "#85929E", True),
+    "รองพื้นทางวัสดุมวลรวม CBR 25%":            ("Aggregate Subbase",   "#FFCC99", False),
+    "วัสดุคัดเลือก ก":                          ("Selected Material",   "#E8DAEF", False),
+    "ดินถมคันทาง / ดินเดิม":                    ("Subgrade",            "#F5CBA7", False),
+    "กำหนดเอง...":                              ("Custom Material",     "#FADBD8", False),
+    "แผ่นคอนกรีต":                              ("Concrete Slab",       "#CCCCCC", False),
+    "Concrete Slab":                            ("Concrete Slab",       "#808080", True),
+}
 
+def create_pavement_structure_figure(layers_data, concrete_thickness_cm=None):
     valid_layers = [l for l in layers_data if l.get("thickness_cm", 0) > 0]
     all_layers = []
     if concrete_thickness_cm and concrete_thickness_cm > 0:
@@ -171,34 +195,45 @@ def create_pavement_structure_figure(layers_data, concrete_thickness_cm=None):
     fig, ax = plt.subplots(figsize=(12, 8))
     width, x_center = 3, 6
     x_start = x_center - width / 2
-    display_heights = [max(l.get("thickness_cm", 0), min_display_height) for l in all_layers]
-    total_display = sum(display_heights)
-    y_current = total_display
+    # ความสูงที่แสดงและพิกัด y ของทุกชั้นคำนวณครั้งเดียวด้วย NumPy (ทุกชั้นหนา > 0 แล้ว)
+    thicknesses = np.fromiter((l.get("thickness_cm", 0) for l in all_layers), dtype=np.float64,
+                              count=len(all_layers))
+    display = np.maximum(thicknesses, min_display_height)
+    total_display = float(display.sum())
+    y_bottoms = total_display - np.cumsum(display)
+    y_centers = y_bottoms + display / 2
+    # มุมทั้ง 4 ของแต่ละชั้น shape (N, 4, 2) สำหรับ PolyCollection
+    verts = np.empty((len(all_layers), 4, 2))
+    verts[:, (0, 3), 0] = x_start
+    verts[:, (1, 2), 0] = x_start + width
+    verts[:, :2, 1] = y_bottoms[:, None]
+    verts[:, 2:, 1] = (y_bottoms + display)[:, None]
+    # ชั้นที่ไม่มีลาย hatch รวมเป็น PolyCollection เดียว (เพิ่มเข้า ax ครั้งเดียว)
+    plain = np.ones(len(all_layers), dtype=bool)
+    layer_colors = []
 
     for i, layer in enumerate(all_layers):
         thickness = layer.get("thickness_cm", 0)
         name = layer.get("name", f"Layer {i+1}")
         e_mpa = layer.get("E_MPa", None)
-        display_h = display_heights[i]
-        if thickness <= 0:
-            continue
-        color = LAYER_COLORS.get(name, "#CCCCCC")
-        hatch_pattern = '///' if name == "วัสดุหมุนเวียน (Recycling)" else None
-        y_bottom = y_current - display_h
-        rect = patches.Rectangle((x_start, y_bottom), width, display_h, linewidth=2,
-                                  edgecolor='black', facecolor=color, hatch=hatch_pattern)
-        ax.add_patch(rect)
-        y_center_pos = y_bottom + display_h / 2
-        display_name = THAI_TO_ENG.get(name, name)
-        is_dark = name in ["รองผิวทางคอนกรีตด้วย AC", "รองผิวทางคอนกรีตด้วย PMA(AC)", "Concrete Slab",
-                          "หินคลุกปรับปรุงคุณภาพด้วยปูนซีเมนต์ (CTB)", "หินคลุกผสมซีเมนต์ UCS 24.5 ksc", "วัสดุหมุนเวียน (Recycling)"]
+        display_name, color, is_dark = LAYER_ATTRS.get(name, (name, "#CCCCCC", False))
+        if name == "วัสดุหมุนเวียน (Recycling)":
+            # hatch กำหนดแยกราย path ใน collection ไม่ได้ จึงวาดเป็น Rectangle
+            plain[i] = False
+            ax.add_patch(patches.Rectangle((x_start, y_bottoms[i]), width, display[i], linewidth=2,
+                                           edgecolor='black', facecolor=color, hatch='///'))
+        else:
+            layer_colors.append(color)
+        y_center_pos = y_centers[i]
         text_color = 'white' if is_dark else 'black'
         ax.text(x_center, y_center_pos, f"{thickness} cm", ha='center', va='center', fontsize=16, fontweight='bold', color=text_color)
         ax.text(x_start - 0.5, y_center_pos, display_name, ha='right', va='center', fontsize=14, fontweight='bold', color='black')
         if e_mpa:
             ax.text(x_start + width + 0.5, y_center_pos, f"E = {e_mpa:,} MPa", ha='left', va='center', fontsize=12, color='#0066CC')
-        y_current = y_bottom
 
+    if layer_colors:
+        ax.add_collection(PolyCollection(verts[plain], facecolors=layer_colors,
+                                         edgecolors='black', linewidths=2))
     ax.annotate('', xy=(x_start + width + 3.5, total_display), xytext=(x_start + width + 3.5, 0),
                 arrowprops=dict(arrowstyle='<->', color='red', lw=2))
     ax.text(x_start + width + 4, total_display / 2, f"Total\n{total_thickness} cm", ha='left', va='center', fontsize=14, color='red', fontweight='bold')
@@ -209,26 +244,55 @@ def create_pavement_structure_figure(layers_data, concrete_thickness_cm=None):
     ax.set_title('Pavement Structure', fontsize=20, fontweight='bold', pad=20)
     ax.text(x_center, -margin + 4, f"Total Pavement Thickness: {total_thickness} cm", ha='center', va='center', fontsize=15, fontweight='bold',
             bbox=dict(boxstyle='round', facecolor='lightyellow', alpha=0.9, edgecolor='orange'))
-    plt.tight_layout()
+    fig.tight_layout()
     return fig
 
-def save_figure_to_bytes(fig):
+def save_figure_to_bytes(fig, dpi=150):
     buf = BytesIO()
-    fig.savefig(buf, format='png', dpi=150, bbox_inches='tight', facecolor='white', edgecolor='none')
+    fig.savefig(buf, format='png', dpi=dpi, bbox_inches='tight', facecolor='white', edgecolor='none',
+                pil_kwargs=PNG_PIL_KWARGS)
     buf.seek(0)
     return buf
 
+def structure_layers_key(layers_data):
+    """แปลง layers_data (list ของ dict) เป็น tuple ที่ hash ได้ สำหรับใช้เป็น key ของ cache"""
+    return tuple(tuple(layer.items()) for layer in layers_data)
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def build_structure_png(layers_key, concrete_thickness_cm=None, dpi=150):
+    """สร้างรูปโครงสร้างชั้นทางเป็น PNG bytes (cache ไว้ ไม่ต้องวาดใหม่ทุกครั้งที่ rerun)
+
+    layers_key: ผลจาก structure_layers_key(layers_data)
+    คืนค่า None ถ้าไม่มีชั้นทางที่มีความหนา
+    """
+    fig = create_pavement_structure_figure([dict(items) for items in layers_key], concrete_thickness_cm)
+    if fig is None:
+        return None
+    png = save_figure_to_bytes(fig, dpi).getvalue()
+    plt.close(fig)
+    return png
+
 # ============================================================
 # ฟังก์ชัน Save/Load JSON  (ไม่เปลี่ยน)
 # ============================================================
 
 def save_project_to_json(project_data):
+    if ORJSON_AVAILABLE:
+        # คืน UTF-8 bytes โดยตรง, รองรับค่า numpy จากการคำนวณ
+        return orjson.dumps(project_data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS
+                            | orjson.OPT_SERIALIZE_NUMPY)
     json_str = json.dumps(project_data, ensure_ascii=False, indent=2)
     return json_str.encode('utf-8')
 
 def load_project_from_json(uploaded_file):
     try:
         content = uploaded_file.read()
+        if ORJSON_AVAILABLE:
+            try:
+                return orjson.loads(content)
+            except orjson.JSONDecodeError:
+                # ไฟล์เก่าที่บันทึกด้วย json มาตรฐานอาจมี NaN/Infinity ซึ่ง orjson ไม่รับ
+                pass
         return json.loads(content.decode('utf-8'))
     except Exception as e:
         st.error(f"เกิดข้อผิดพลาดในการอ่านไฟล์: {str(e)}")
@@ -239,11 +303,11 @@ def collect_design_data(project_name, pavement_type, num_layers, layers_data, w1
                         mr_val=0, esb_val=0, dsb_val=0, k_inf_val=0, ls_select=0, k_corrected=0,
                         img1_bytes=None, img2_bytes=None,
                         img1_original=None, img2_original=None,
-                        img1_sliders=None, img2_sliders=None):
+                        img1_sliders=None, img2_sliders=None, timestamp=None):
     import base64
     return {
         "version": "1.0",
-        "save_date": datetime.now().isoformat(),
+        "save_date": (timestamp or datetime.now()).isoformat(),
         "project_info": {"project_name": project_name, "pavement_type": pavement_type},
         "layers": {"num_layers": num_layers, "layers_data": layers_data},
         "design_parameters": {
@@ -273,14 +337,94 @@ def collect_design_data(project_name, pavement_type, num_layers, layers_data, w1
             "axis_bottom": img2_sliders.get("axis_bottom"),
         }
     }
+
+# สมการ AASHTO 1993 สำหรับรายงานแบบย่อ — ส่วนของแต่ละบรรทัดเป็น (text, bold, italic, subscript, superscript)
+# บรรทัดที่ 1: log10(W18) = ZR x So + 7.35 x log10(D+1) - 0.06
+EQ_LINE1_PARTS = (
+    ('log', False, False, False, False),
+    ('10', False, False, True, False),
+    ('(W', False, False, False, False),
+    ('18', False, False, True, False),
+    (') = Z', False, False, False, False),
+    ('R', False, False, True, False),
+    (' x S', False, False, False, False),
+    ('o', False, False, True, False),
+    (' + 7.35 x log', False, False, False, False),
+    ('10', False, False, True, False),
+    ('(D+1) - 0.06', False, False, False, False),
+)
+
+# บรรทัดที่ 2: + log10(ΔPSI/(4.5-1.5)) / (1 + 1.624x10^7/(D+1)^8.46)
+EQ_LINE2_PARTS = (
+    ('        + log', False, False, False, False),
+    ('10', False, False, True, False),
+    ('(\u0394PSI/(4.5-1.5)) / (1 + 1.624\u00d710', False, False, False, False),
+    ('7', False, False, False, True),
+    ('/(D+1)', False, False, False, False),
+    ('8.46', False, False, False, True),
+    (')', False, False, False, False),
+)
+
+# บรรทัดที่ 3: + (4.22 - 0.32xPt) x log10([ScxCdx(D^0.75-1.132)/(215.63xJx(D^0.75-18.42/(Ec/k)^0.25))])
+EQ_LINE3_PARTS = (
+    ('        + (4.22 - 0.32\u00d7P', False, False, False, False),
+    ('t', False, False, True, False),
+    (') \u00d7 log', False, False, False, False),
+    ('10', False, False, True, False),
+    ('[(S', False, False, False, False),
+    ('c', False, False, True, False),
+    ('\u00d7C', False, False, False, False),
+    ('d', False, False, True, False),
+    ('\u00d7(D', False, False, False, False),
+    ('0.75', False, False, False, True),
+    ('-1.132))/(215.63\u00d7J\u00d7(D', False, False, False, False),
+    ('0.75', False, False, False, True),
+    (' - 18.42/(E', False, False, False, False),
+    ('c', False, False, True, False),
+    ('/k)', False, False, False, False),
+    ('0.25', False, False, False, True),
+    (')]', False, False, False, False),
+)
+
+# namespace ของ WordprocessingML ในรูป Clark notation สำหรับ etree.SubElement
+W_NS = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+
+def _w_sub(parent, tag, **attrs):
+    """ต่อท้าย element w:<tag> พร้อม attribute w:* ใน call เดียว (ไม่ผ่าน OxmlElement + qn)"""
+    return etree.SubElement(parent, W_NS + tag, {W_NS + k: v for k, v in attrs.items()})
+
+def _add_equation_line(document, parts):
+    """
+    เพิ่มย่อหน้าที่ประกอบด้วย runs หลายส่วน
+    parts = tuple ของ (text, bold, italic, subscript, superscript)
+    """
+    p = document.add_paragraph()
+    p.alignment = WD_ALIGN_PARAGRAPH.LEFT
+    for text, bold, italic, is_sub, is_sup in parts:
+        run = p.add_run(text)
+        run.bold = bold
+        run.italic = italic
+        run.font.name = 'Times New Roman'
+        run.font.size = Pt(15)
+        if is_sub or is_sup:
+            rPr = run._r.get_or_add_rPr()
+            _w_sub(rPr, 'vertAlign', val='subscript' if is_sub else 'superscript')
+    return p
+
+def _set_paragraph_indent(para, left_twips=360):
+    pPr = para._p.get_or_add_pPr()
+    _w_sub(pPr, 'ind', left=str(left_twips))
+
+def _fill_table(table, rows):
+    """เติมข้อความลงตารางที่สร้างไว้ครบจำนวนแถวแล้ว (rows = list ของ tuple ข้อความรายแถว)"""
+    for tbl_row, values in zip(table.rows, rows):
+        for cell, text in zip(tbl_row.cells, values):
+            cell.text = text
+
 def create_word_report(pavement_type, inputs, calculated_values, comparison_results, selected_d_cm,
                        main_result, layers_data=None, project_name="", structure_figure=None,
-                       subgrade_info=None, e_equivalent_psi=0):
-    try:
-        from docx import Document
-        from docx.shared import Inches, Pt
-        from docx.enum.text import WD_ALIGN_PARAGRAPH
-    except ImportError:
+                       subgrade_info=None, e_equivalent_psi=0, structure_png=None, timestamp=None):
+    if not DOCX_AVAILABLE:
         st.error("กรุณาติดตั้ง python-docx: pip install python-docx")
         return None
     
@@ -298,46 +442,34 @@ def create_word_report(pavement_type, inputs, calculated_values, comparison_resu
     if project_name:
         doc.add_paragraph(f'ชื่อโครงการ: {project_name}')
     doc.add_paragraph(f'ประเภทถนน: {pavement_type}')
-    doc.add_paragraph(f'วันที่คำนวณ: {datetime.now().strftime("%d/%m/%Y %H:%M")}')
+    doc.add_paragraph(f'วันที่คำนวณ: {(timestamp or datetime.now()):%d/%m/%Y %H:%M}')
     
     doc.add_heading('2. ชั้นโครงสร้างทาง', level=1)
-    table_layers = doc.add_table(rows=1, cols=4)
-    table_layers.style = 'Table Grid'
-    hdr = table_layers.rows[0].cells
-    hdr[0].text, hdr[1].text, hdr[2].text, hdr[3].text = 'ลำดับ', 'ชนิดวัสดุ', 'ความหนา (ซม.)', 'Modulus E (MPa)'
-    row = table_layers.add_row().cells
-    row[0].text, row[1].text, row[2].text, row[3].text = '1', f'ผิวทางคอนกรีต {pavement_type}', f'{selected_d_cm}', '-'
-    layer_count = 1
+    # เตรียมข้อความทุกแถวก่อน แล้วสร้างตารางครบจำนวนแถวในครั้งเดียว (ไม่ต้อง add_row ทีละแถว)
+    layer_rows = [('ลำดับ', 'ชนิดวัสดุ', 'ความหนา (ซม.)', 'Modulus E (MPa)'),
+                  ('1', f'ผิวทางคอนกรีต {pavement_type}', f'{selected_d_cm}', '-')]
     if layers_data:
-        for i, layer in enumerate(layers_data):
-            layer_count += 1
-            row = table_layers.add_row().cells
-            row[0].text = str(layer_count)
-            row[1].text = layer.get('name', f'Layer {i+1}')
-            row[2].text = f"{layer.get('thickness_cm', 0)}"
-            row[3].text = f"{layer.get('E_MPa', 0):,}"
+        layer_rows += [(str(i + 2), layer.get('name', f'Layer {i+1}'), f"{layer.get('thickness_cm', 0)}",
+                        f"{layer.get('E_MPa', 0):,}") for i, layer in enumerate(layers_data)]
     if subgrade_info:
-        layer_count += 1
-        row = table_layers.add_row().cells
-        row[0].text = str(layer_count)
-        row[1].text = 'ดินคันทาง'
-        row[2].text = f"CBR {subgrade_info.get('cbr', 0)} %"
-        row[3].text = f"{subgrade_info.get('mr_mpa', 0):.0f} ({subgrade_info.get('mr_psi', 0):,.0f} psi)"
+        layer_rows.append((str(len(layer_rows)), 'ดินคันทาง', f"CBR {subgrade_info.get('cbr', 0)} %",
+                           f"{subgrade_info.get('mr_mpa', 0):.0f} ({subgrade_info.get('mr_psi', 0):,.0f} psi)"))
+    _fill_table(doc.add_table(rows=len(layer_rows), cols=4, style='Table Grid'), layer_rows)
     
-    if structure_figure:
-        doc.add_paragraph('รูปตัดโครงสร้างชั้นทาง:')
+    # ใช้ PNG ที่ผู้เรียกเข้ารหัสไว้แล้ว (structure_png) ถ้ามี — ไม่ต้อง savefig ซ้ำ
+    if structure_png is None and structure_figure:
         img_buf = BytesIO()
-        structure_figure.savefig(img_buf, format='png', dpi=150, bbox_inches='tight', facecolor='white')
-        img_buf.seek(0)
-        doc.add_picture(img_buf, width=Inches(5.5))
+        structure_figure.savefig(img_buf, format='png', dpi=WORD_FIGURE_DPI, bbox_inches='tight', facecolor='white',
+                                 pil_kwargs=PNG_PIL_KWARGS)
+        structure_png = img_buf.getvalue()
+    if structure_png:
+        doc.add_paragraph('รูปตัดโครงสร้างชั้นทาง:')
+        doc.add_picture(BytesIO(structure_png), width=Inches(5.5))
         doc.paragraphs[-1].alignment = WD_ALIGN_PARAGRAPH.CENTER
     
     doc.add_heading('3. ข้อมูลนำเข้า', level=1)
-    table1 = doc.add_table(rows=1, cols=4)
-    table1.style = 'Table Grid'
-    hdr = table1.rows[0].cells
-    hdr[0].text, hdr[1].text, hdr[2].text, hdr[3].text = 'พารามิเตอร์', 'สัญลักษณ์', 'ค่า', 'หน่วย'
     input_data = [
+        ('พารามิเตอร์', 'สัญลักษณ์', 'ค่า', 'หน่วย'),
         ('ESAL ออกแบบ', 'W₁₈', f"{inputs['w18_design']:,.0f}", 'ESALs'),
         ('Terminal Serviceability', 'Pt', f"{inputs['pt']:.1f}", '-'),
         ('Reliability', 'R', f"{inputs['reliability']:.0f}", '%'),
@@ -349,115 +481,29 @@ def create_word_report(pavement_type, inputs, calculated_values, comparison_resu
         ('Load Transfer Coefficient', 'J', f"{inputs['j']:.1f}", '-'),
         ('Drainage Coefficient', 'Cd', f"{inputs['cd']:.1f}", '-'),
     ]
-    for param, symbol, value, unit in input_data:
-        row = table1.add_row().cells
-        row[0].text, row[1].text, row[2].text, row[3].text = param, symbol, value, unit
+    _fill_table(doc.add_table(rows=len(input_data), cols=4, style='Table Grid'), input_data)
     
     doc.add_heading('4. ค่าที่คำนวณได้', level=1)
-    table2 = doc.add_table(rows=1, cols=4)
-    table2.style = 'Table Grid'
-    hdr = table2.rows[0].cells
-    hdr[0].text, hdr[1].text, hdr[2].text, hdr[3].text = 'พารามิเตอร์', 'สัญลักษณ์', 'ค่า', 'หน่วย'
     calc_data = [
+        ('พารามิเตอร์', 'สัญลักษณ์', 'ค่า', 'หน่วย'),
         ('Modulus of Elasticity', 'Ec', f"{calculated_values['ec']:,.0f}", 'psi'),
         ('Standard Normal Deviate', 'ZR', f"{calculated_values['zr']:.3f}", '-'),
         ('การสูญเสีย Serviceability', 'ΔPSI', f"{calculated_values['delta_psi']:.1f}", '-'),
     ]
-    for param, symbol, value, unit in calc_data:
-        row = table2.add_row().cells
-        row[0].text, row[1].text, row[2].text, row[3].text = param, symbol, value, unit
+    _fill_table(doc.add_table(rows=len(calc_data), cols=4, style='Table Grid'), calc_data)
     
     # --------------------------------------------------------
     # 5. สมการออกแบบ AASHTO 1993
     # --------------------------------------------------------
     doc.add_heading('5. สมการออกแบบ AASHTO 1993', level=1)
 
-    from docx.oxml.ns import qn
-    from docx.oxml import OxmlElement
-
-    def add_equation_line(document, parts):
-        """
-        เพิ่มย่อหน้าที่ประกอบด้วย runs หลายส่วน
-        parts = list of (text, bold, italic, subscript, superscript)
-        """
-        p = document.add_paragraph()
-        p.alignment = WD_ALIGN_PARAGRAPH.LEFT
-        for text, bold, italic, is_sub, is_sup in parts:
-            run = p.add_run(text)
-            run.bold = bold
-            run.italic = italic
-            run.font.name = 'Times New Roman'
-            run.font.size = Pt(15)
-            if is_sub or is_sup:
-                rPr = run._r.get_or_add_rPr()
-                vertAlign = OxmlElement('w:vertAlign')
-                vertAlign.set(qn('w:val'), 'subscript' if is_sub else 'superscript')
-                rPr.append(vertAlign)
-        return p
-
-    def set_paragraph_indent(para, left_twips=360):
-        pPr = para._p.get_or_add_pPr()
-        ind = OxmlElement('w:ind')
-        ind.set(qn('w:left'), str(left_twips))
-        pPr.append(ind)
-
     # คำอธิบาย
     p_desc = doc.add_paragraph('สมการหลักที่ใช้ในการออกแบบความหนาถนนคอนกรีตตาม AASHTO 1993 มีดังนี้:')
     p_desc.runs[0].font.name = 'TH SarabunPSK'
     p_desc.runs[0].font.size = Pt(15)
 
-    # บรรทัดที่ 1: log10(W18) = ZR x So + 7.35 x log10(D+1) - 0.06
-    line1_parts = [
-        ('log', False, False, False, False),
-        ('10', False, False, True, False),
-        ('(W', False, False, False, False),
-        ('18', False, False, True, False),
-        (') = Z', False, False, False, False),
-        ('R', False, False, True, False),
-        (' x S', False, False, False, False),
-        ('o', False, False, True, False),
-        (' + 7.35 x log', False, False, False, False),
-        ('10', False, False, True, False),
-        ('(D+1) - 0.06', False, False, False, False),
-    ]
-    p1 = add_equation_line(doc, line1_parts)
-    set_paragraph_indent(p1, 360)
-
-    # บรรทัดที่ 2: + log10(ΔPSI/(4.5-1.5)) / (1 + 1.624x10^7/(D+1)^8.46)
-    line2_parts = [
-        ('        + log', False, False, False, False),
-        ('10', False, False, True, False),
-        ('(\u0394PSI/(4.5-1.5)) / (1 + 1.624\u00d710', False, False, False, False),
-        ('7', False, False, False, True),
-        ('/(D+1)', False, False, False, False),
-        ('8.46', False, False, False, True),
-        (')', False, False, False, False),
-    ]
-    p2 = add_equation_line(doc, line2_parts)
-    set_paragraph_indent(p2, 360)
-
-    # บรรทัดที่ 3: + (4.22 - 0.32xPt) x log10([ScxCdx(D^0.75-1.132)/(215.63xJx(D^0.75-18.42/(Ec/k)^0.25))])
-    line3_parts = [
-        ('        + (4.22 - 0.32\u00d7P', False, False, False, False),
-        ('t', False, False, True, False),
-        (') \u00d7 log', False, False, False, False),
-        ('10', False, False, True, False),
-        ('[(S', False, False, False, False),
-        ('c', False, False, True, False),
-        ('\u00d7C', False, False, False, False),
-        ('d', False, False, True, False),
-        ('\u00d7(D', False, False, False, False),
-        ('0.75', False, False, False, True),
-        ('-1.132))/(215.63\u00d7J\u00d7(D', False, False, False, False),
-        ('0.75', False, False, False, True),
-        (' - 18.42/(E', False, False, False, False),
-        ('c', False, False, True, False),
-        ('/k)', False, False, False, False),
-        ('0.25', False, False, False, True),
-        (')]', False, False, False, False),
-    ]
-    p3 = add_equation_line(doc, line3_parts)
-    set_paragraph_indent(p3, 360)
+    for parts in (EQ_LINE1_PARTS, EQ_LINE2_PARTS, EQ_LINE3_PARTS):
+        _set_paragraph_indent(_add_equation_line(doc, parts), 360)
 
     # ตารางสัญลักษณ์
     doc.add_paragraph()
@@ -465,19 +511,8 @@ def create_word_report(pavement_type, inputs, calculated_values, comparison_resu
     p_sym.runs[0].font.name = 'TH SarabunPSK'
     p_sym.runs[0].font.size = Pt(15)
 
-    tbl_sym = doc.add_table(rows=1, cols=3)
-    tbl_sym.style = 'Table Grid'
-    hdr_sym = tbl_sym.rows[0].cells
-    hdr_sym[0].text = 'สัญลักษณ์'
-    hdr_sym[1].text = 'ความหมาย'
-    hdr_sym[2].text = 'หน่วย'
-    for cell in hdr_sym:
-        run = cell.paragraphs[0].runs[0]
-        run.bold = True
-        run.font.name = 'TH SarabunPSK'
-        run.font.size = Pt(15)
-
     symbol_data = [
+        ('สัญลักษณ์', 'ความหมาย', 'หน่วย'),
         ('W\u2081\u2088',        'จำนวนแกนเดี่ยว 18 kip ที่รองรับได้',     'ESALs'),
         ('Z\u1D3F',              'Standard Normal Deviate ที่ความเชื่อมั่น R', '-'),
         ('S\u2092',              'Overall Standard Deviation',               '-'),
@@ -490,13 +525,13 @@ def create_word_report(pavement_type, inputs, calculated_values, comparison_resu
         ('E\u1D9C',              'Modulus of Elasticity ของคอนกรีต',         'psi'),
         ('k',                    'Modulus of Subgrade Reaction',             'pci'),
     ]
-    for sym, meaning, unit in symbol_data:
-        row_s = tbl_sym.add_row().cells
-        row_s[0].text = sym
-        row_s[1].text = meaning
-        row_s[2].text = unit
-        for cell in row_s:
+    tbl_sym = doc.add_table(rows=len(symbol_data), cols=3, style='Table Grid')
+    _fill_table(tbl_sym, symbol_data)
+    for i, row_s in enumerate(tbl_sym.rows):
+        for cell in row_s.cells:
             run = cell.paragraphs[0].runs[0]
+            if i == 0:
+                run.bold = True
             run.font.name = 'TH SarabunPSK'
             run.font.size = Pt(15)
 
@@ -506,27 +541,18 @@ def create_word_report(pavement_type, inputs, calculated_values, comparison_resu
     # 6. ผลการเปรียบเทียบความหนา (เดิมคือหัวข้อ 5)
     # --------------------------------------------------------
     doc.add_heading('6. ผลการเปรียบเทียบความหนา', level=1)
-    table3 = doc.add_table(rows=1, cols=6)
-    table3.style = 'Table Grid'
-    hdr = table3.rows[0].cells
-    hdr[0].text, hdr[1].text, hdr[2].text = 'D (ซม.)', 'D (นิ้ว)', 'log₁₀(W₁₈)'
-    hdr[3].text, hdr[4].text, hdr[5].text = 'W₁₈ รองรับได้', 'อัตราส่วน', 'ผล'
+    comparison_rows = [('D (ซม.)', 'D (นิ้ว)', 'log₁₀(W₁₈)', 'W₁₈ รองรับได้', 'อัตราส่วน', 'ผล')]
+    w18_by_d_cm = {}  # ใช้หา W18 ของความหนาที่เลือกในหัวข้อสรุปผล
     for r in comparison_results:
-        row = table3.add_row().cells
-        row[0].text = f"{r['d_cm']:.0f}"
-        row[1].text = f"{r['d_inch']:.0f}"
-        row[2].text = f"{r['log_w18']:.4f}"
-        row[3].text = f"{r['w18']:,.0f}"
-        row[4].text = f"{r['ratio']:.2f}"
-        row[5].text = "ผ่าน ✓" if r['passed'] else "ไม่ผ่าน ✗"
+        comparison_rows.append((f"{r['d_cm']:.0f}", f"{r['d_inch']:.0f}", f"{r['log_w18']:.4f}",
+                                f"{r['w18']:,.0f}", f"{r['ratio']:.2f}",
+                                "ผ่าน ✓" if r['passed'] else "ไม่ผ่าน ✗"))
+        w18_by_d_cm[r['d_cm']] = r['w18']
+    _fill_table(doc.add_table(rows=len(comparison_rows), cols=6, style='Table Grid'), comparison_rows)
 
     doc.add_heading('7. สรุปผล', level=1)
     passed, ratio = main_result
-    w18_cap = None
-    for r in comparison_results:
-        if r['d_cm'] == selected_d_cm:
-            w18_cap = r['w18']
-            break
+    w18_cap = w18_by_d_cm.get(selected_d_cm)
     e_eq_mpa = e_equivalent_psi / 145.038 if e_equivalent_psi > 0 else 0
     doc.add_paragraph(f"ความหนาที่เลือก: {selected_d_cm:.0f} ซม. ({selected_d_inch:.0f} นิ้ว)")
     doc.add_paragraph(f"ESAL ที่ต้องการ: {inputs['w18_design']:,.0f} ESALs")
@@ -537,16 +563,10 @@ def create_word_report(pavement_type, inputs, calculated_values, comparison_resu
     
     buffer = BytesIO()
     doc.save(buffer)
-    buffer.seek(0)
-    return buffer
+    return buffer.getvalue()
 
-def generate_word_report_nomograph(params, img1_bytes, img2_bytes=None):
-    try:
-        from docx import Document
-        from docx.shared import Inches, Pt
-        from docx.enum.text import WD_ALIGN_PARAGRAPH
-        from docx.enum.table import WD_TABLE_ALIGNMENT
-    except ImportError:
+def generate_word_report_nomograph(params, img1_bytes, img2_bytes=None, timestamp=None):
+    if not DOCX_AVAILABLE:
         return None, "ไม่พบ library python-docx"
     
     doc = Document()
@@ -556,24 +576,20 @@ def generate_word_report_nomograph(params, img1_bytes, img2_bytes=None):
     
     title = doc.add_heading('รายการคำนวณ Corrected Modulus of Subgrade Reaction', 0)
     title.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    doc.add_paragraph(f'วันที่: {datetime.now().strftime("%d/%m/%Y %H:%M")}').alignment = WD_ALIGN_PARAGRAPH.RIGHT
+    doc.add_paragraph(f'วันที่: {(timestamp or datetime.now()):%d/%m/%Y %H:%M}').alignment = WD_ALIGN_PARAGRAPH.RIGHT
     
     doc.add_heading('ส่วนที่ 1: การหาค่า Composite Modulus (k∞)', level=1)
-    table = doc.add_table(rows=1, cols=3)
-    table.style = 'Table Grid'
-    hdr = table.rows[0].cells
-    hdr[0].text, hdr[1].text, hdr[2].text = 'พารามิเตอร์', 'ค่า', 'หน่วย'
-    for h in hdr:
-        h.paragraphs[0].runs[0].bold = True
     data1 = [
+        ('พารามิเตอร์', 'ค่า', 'หน่วย'),
         ('Roadbed Soil Resilient Modulus (MR)', f"{params.get('MR', 0):,.0f}", 'psi'),
         ('Subbase Elastic Modulus (ESB)', f"{params.get('ESB', 0):,.0f}", 'psi'),
         ('Subbase Thickness (DSB)', f"{params.get('DSB', 0):.1f}", 'inches'),
         ('Composite Modulus (k∞)', f"{params.get('k_inf', 0):,.0f}", 'pci'),
     ]
-    for p, v, u in data1:
-        row = table.add_row().cells
-        row[0].text, row[1].text, row[2].text = p, v, u
+    table = doc.add_table(rows=len(data1), cols=3, style='Table Grid')
+    _fill_table(table, data1)
+    for h in table.rows[0].cells:
+        h.paragraphs[0].runs[0].bold = True
     if img1_bytes:
         doc.add_paragraph()
         doc.add_picture(io.BytesIO(img1_bytes), width=Inches(5.5))
@@ -581,20 +597,16 @@ def generate_word_report_nomograph(params, img1_bytes, img2_bytes=None):
     
     doc.add_page_break()
     doc.add_heading('ส่วนที่ 2: การปรับแก้ค่า Loss of Support (LS)', level=1)
-    table2 = doc.add_table(rows=1, cols=3)
-    table2.style = 'Table Grid'
-    hdr2 = table2.rows[0].cells
-    hdr2[0].text, hdr2[1].text, hdr2[2].text = 'พารามิเตอร์', 'ค่า', 'หน่วย'
-    for h in hdr2:
-        h.paragraphs[0].runs[0].bold = True
     data2 = [
+        ('พารามิเตอร์', 'ค่า', 'หน่วย'),
         ('Effective Modulus (k) - จากส่วนที่ 1', f"{params.get('k_inf', 0):,.0f}", 'pci'),
         ('Loss of Support Factor (LS)', f"{params.get('LS_factor', 0):.1f}", '-'),
         ('Corrected Modulus (k)', f"{params.get('k_corrected', 0):,.0f}", 'pci'),
     ]
-    for p, v, u in data2:
-        row = table2.add_row().cells
-        row[0].text, row[1].text, row[2].text = p, v, u
+    table2 = doc.add_table(rows=len(data2), cols=3, style='Table Grid')
+    _fill_table(table2, data2)
+    for h in table2.rows[0].cells:
+        h.paragraphs[0].runs[0].bold = True
     if img2_bytes:
         doc.add_paragraph()
         doc.add_picture(io.BytesIO(img2_bytes), width=Inches(5.5))
@@ -605,8 +617,7 @@ def generate_word_report_nomograph(params, img1_bytes, img2_bytes=None):
     
     buffer = io.BytesIO()
     doc.save(buffer)
-    buffer.seek(0)
-    return buffer, None
+    return buffer.getvalue(), None
 
 # ============================================================
 # ฟังก์ชันสร้างรายงาน Word ฉบับสมบูรณ์ (พร้อมบทเกริ่นนำ + เลขหัวข้อยืดหยุ่น)
@@ -635,35 +646,113 @@ def _heading_num(prefix, sub=None):
         return prefix
     return f"{prefix}.{sub}"
 
-def _setup_doc_styles(doc):
-    """ตั้งค่า Font, Page A4, Margin"""
-    from docx.shared import Pt, Cm
-    from docx.oxml.ns import qn
-    from docx.oxml import OxmlElement
+# ── แม่แบบ XML ของเซลล์ตาราง: padding 80 dxa ทุกด้าน และสีพื้นเซลล์ ───────────
+CELL_MARGIN_XML = (
+    '<w:tcMar %s>'
+    '<w:top w:w="80" w:type="dxa"/><w:bottom w:w="80" w:type="dxa"/>'
+    '<w:left w:w="80" w:type="dxa"/><w:right w:w="80" w:type="dxa"/>'
+    '</w:tcMar>'
+)
+CELL_SHADING_XML = '<w:shd %s w:val="clear" w:color="auto" w:fill="%s"/>'
 
+@lru_cache(maxsize=None)
+def _cell_margin_template():
+    """parse w:tcMar ครั้งเดียว — แต่ละเซลล์ใช้ deepcopy แทนการสร้าง element ทีละตัว"""
+    return parse_xml(CELL_MARGIN_XML % nsdecls('w'))
+
+def _add_cell_margin(tcPr):
+    tcPr.append(deepcopy(_cell_margin_template()))
+
+def _add_cell_shading(tcPr, fill):
+    tcPr.append(parse_xml(CELL_SHADING_XML % (nsdecls('w'), fill)))
+
+# ย่อหน้าเดียวในเซลล์: จัดแนว + run เดียว (rFonts, b, sz) — สร้างจาก XML ทีเดียว
+CELL_PARAGRAPH_XML = (
+    '<w:p><w:pPr><w:jc w:val="%s"/></w:pPr>'
+    '<w:r><w:rPr><w:rFonts w:ascii="%s" w:hAnsi="%s"/>%s<w:sz w:val="%d"/></w:rPr>'
+    '%s</w:r></w:p>'
+)
+_BOLD_XML = {None: '', True: '<w:b/>', False: '<w:b w:val="0"/>'}
+
+# \t -> w:tab, \n/\r -> w:br เหมือน run.text ของ python-docx (ใส่ลงใน w:t ตรงๆ Word จะยุบทิ้ง)
+_RUN_SPECIAL_RE = re.compile(r'([\t\n\r])')
+_RUN_SPECIAL_XML = {'\t': '<w:tab/>', '\n': '<w:br/>', '\r': '<w:br/>'}
+
+def _run_content_xml(text):
+    """XML เนื้อหาของ run: w:t ที่ escape แล้ว คั่นด้วย w:tab / w:br"""
+    parts = []
+    for chunk in _RUN_SPECIAL_RE.split(text):
+        if chunk in _RUN_SPECIAL_XML:
+            parts.append(_RUN_SPECIAL_XML[chunk])
+        elif chunk != chunk.strip():
+            parts.append('<w:t xml:space="preserve">%s</w:t>' % escape(chunk))
+        elif chunk:
+            parts.append('<w:t>%s</w:t>' % escape(chunk))
+    return ''.join(parts)
+
+def _cell_paragraph_xml(text, font, size, bold=None, align=None):
+    """XML ของย่อหน้าในเซลล์ (ไม่มี namespace declaration — ใช้ต่อเป็น blob ได้)"""
+    t_xml = _run_content_xml(str(text))
+    jc = align.xml_value if align is not None else 'left'
+    font = escape(font, {'"': '&quot;'})
+    return CELL_PARAGRAPH_XML % (jc, font, font, _BOLD_XML[bold], round(size.pt * 2), t_xml)
+
+def _write_cell_text(cell, text, font, size, bold=None, align=None):
+    """แทนเนื้อหาเซลล์ด้วยย่อหน้าเดียว — เทียบเท่า cell.text='' + add_run แต่ไม่ผ่าน proxy"""
+    tc = cell._tc
+    tc.clear_content()
+    tc.append(parse_xml('<w:tc %s>%s</w:tc>' % (
+        nsdecls('w'), _cell_paragraph_xml(text, font, size, bold, align)))[0])
+
+def _table_cell_xml(width, paragraph_xml, fill=None, span=1):
+    """XML ของ w:tc: กว้าง dxa, gridSpan (ถ้า merge), สีพื้น และ padding มาตรฐาน"""
+    return '<w:tc><w:tcPr><w:tcW w:w="%d" w:type="dxa"/>%s%s%s</w:tcPr>%s</w:tc>' % (
+        width,
+        '<w:gridSpan w:val="%d"/>' % span if span > 1 else '',
+        CELL_SHADING_XML % ('', fill) if fill else '',
+        CELL_MARGIN_XML % '',
+        paragraph_xml)
+
+def _append_table_rows(table, rows):
+    """rows = list ของแถว (list ของ XML w:tc) — parse ครั้งเดียวแล้วต่อท้าย w:tbl
+    ไม่ผ่าน add_row()/row.cells ที่ต้องสร้าง grid ของตารางใหม่ทุกครั้ง"""
+    blob = parse_xml('<w:tbl %s>%s</w:tbl>' % (
+        nsdecls('w'), ''.join('<w:tr>%s</w:tr>' % ''.join(r) for r in rows)))
+    table._tbl.extend(list(blob))
+
+def _set_cell(cell, text, bold=False, align=None, bg=None, font=None, size=None):
+    """ข้อความในเซลล์ + padding มาตรฐาน + สีพื้น (ถ้ามี) — default คือ TH SarabunPSK 15pt"""
+    _write_cell_text(cell, text, font or _get_font_name(), size or Pt(15), bold, align)
+    tcPr = cell._tc.get_or_add_tcPr()
+    _add_cell_margin(tcPr)
+    if bg:
+        _add_cell_shading(tcPr, bg)
+
+def _set_row_widths(row, widths):
+    """ความกว้างเซลล์ (dxa) ทีละคอลัมน์ของแถว"""
+    for cell, width in zip(row.cells, widths):
+        _w_sub(cell._tc.get_or_add_tcPr(), 'tcW', w=str(width), type='dxa')
+
+def _setup_doc_styles(doc):
+    """ตั้งค่า Font, Page A4, Margin — เรียกซ้ำกับเอกสารเดิมจะข้ามไป
+    ผู้เรียกที่ใช้ template ของตัวเองตั้ง doc._pavement_styled = True ไว้ก่อน เพื่อคงการตั้งหน้าเดิม"""
+    if getattr(doc, '_pavement_styled', False):
+        return
     font_name = _get_font_name()
     style = doc.styles['Normal']
     style.font.name = font_name
     style.font.size = Pt(15)
-    # ตั้งค่า font สำหรับ East Asian
-    rPr = style.element.get_or_add_rPr()
 
     # ตั้ง page A4 + margin
     section = doc.sections[0]
-    section.page_width  = int(21.0 * 914400 / 25.4 * 914400 / 914400)   # 21 cm
-    section.page_height = int(29.7 * 914400 / 25.4 * 914400 / 914400)   # 29.7 cm
-    from docx.shared import Cm
-    section.page_width  = Cm(21.0)
-    section.page_height = Cm(29.7)
-    section.left_margin   = Cm(2.5)
-    section.right_margin  = Cm(2.5)
-    section.top_margin    = Cm(2.5)
-    section.bottom_margin = Cm(2.0)
+    section.page_width  = PAGE_WIDTH
+    section.page_height = PAGE_HEIGHT
+    (section.left_margin, section.right_margin,
+     section.top_margin, section.bottom_margin) = PAGE_MARGINS
+    doc._pavement_styled = True
 
 def _add_heading(doc, text, level=1):
     """หัวข้อแบบ bold + underline (ตามภาพตัวอย่าง) ไม่ใช้ Heading style"""
-    from docx.shared import Pt
-    from docx.enum.text import WD_ALIGN_PARAGRAPH
     p = doc.add_paragraph()
     p.alignment = WD_ALIGN_PARAGRAPH.LEFT
     run = p.add_run(text)
@@ -674,8 +763,6 @@ def _add_heading(doc, text, level=1):
     return p
 
 def _add_para(doc, text, bold=False, italic=False, indent_cm=0, justify=True):
-    from docx.shared import Pt, Cm
-    from docx.enum.text import WD_ALIGN_PARAGRAPH
     p = doc.add_paragraph()
     p.alignment = WD_ALIGN_PARAGRAPH.THAI_JUSTIFY if justify else WD_ALIGN_PARAGRAPH.LEFT
     run = p.add_run(text)
@@ -687,14 +774,30 @@ def _add_para(doc, text, bold=False, italic=False, indent_cm=0, justify=True):
         p.paragraph_format.left_indent = Cm(indent_cm)
     return p
 
+# สมการ + ตารางสัญลักษณ์เป็นเนื้อหาคงที่ — สร้างครั้งเดียวใน st.cache_resource (อยู่รอดข้าม rerun)
+# แล้ว deepcopy เข้าแต่ละรายงาน
+@st.cache_resource(show_spinner=False)
+def _equation_section_prototype():
+    """element ต้นแบบของหัวข้อสมการ (ห้ามแก้ไขโดยตรง ต้อง deepcopy ก่อนใช้)"""
+    doc = Document()
+    _setup_doc_styles(doc)   # ความกว้าง tblGrid ขึ้นกับขนาดหน้า/margin
+    body = doc.element.body
+    n = len(body)
+    _build_equation_section(doc)
+    return tuple(body[n - 1:-1] if body.sectPr is not None else body[n:])
+
 def _add_equation_section(doc):
-    """สมการ AASHTO 1993 — Times New Roman 12pt พร้อม subscript/superscript และตารางสัญลักษณ์"""
-    from docx.shared import Pt, Cm
-    from docx.oxml.ns import qn
-    from docx.oxml import OxmlElement
-    from docx.enum.text import WD_ALIGN_PARAGRAPH
-    from docx.enum.table import WD_TABLE_ALIGNMENT
+    """สมการ AASHTO 1993 — คัดลอกจากต้นแบบที่ cache ไว้"""
+    body = doc.element.body
+    sectPr = body.sectPr
+    for el in _equation_section_prototype():
+        if sectPr is not None:
+            sectPr.addprevious(deepcopy(el))
+        else:
+            body.append(deepcopy(el))
 
+def _build_equation_section(doc):
+    """สมการ AASHTO 1993 — Times New Roman 12pt พร้อม subscript/superscript และตารางสัญลักษณ์"""
     EQ_FONT = 'Times New Roman'
     EQ_SIZE = Pt(11)
     TH_FONT = _get_font_name()
@@ -707,9 +810,7 @@ def _add_equation_section(doc):
         run.bold = bold
         if sub or sup:
             rPr = run._r.get_or_add_rPr()
-            va = OxmlElement('w:vertAlign')
-            va.set(qn('w:val'), 'subscript' if sub else 'superscript')
-            rPr.append(va)
+            _w_sub(rPr, 'vertAlign', val='subscript' if sub else 'superscript')
         return run
 
     def eq_line():
@@ -754,9 +855,6 @@ def _add_equation_section(doc):
     r_by.font.name = TH_FONT; r_by.font.size = TH_SIZE
 
     # ตารางสัญลักษณ์
-    from docx.oxml.ns import qn as _qn
-    from docx.oxml import OxmlElement as _OE
-
     HEADER_BG = 'BDD7EE'
     col_w_sym = [1396, 6281, 1395]
 
@@ -764,35 +862,10 @@ def _add_equation_section(doc):
     tbl.style = 'Table Grid'
     tbl.alignment = WD_TABLE_ALIGNMENT.LEFT
 
-    def _sym_cell(cell, text, bold=False, font=TH_FONT, fsize=TH_SIZE, bg=None,
-                  align=WD_ALIGN_PARAGRAPH.LEFT):
-        cell.text = ''
-        p = cell.paragraphs[0]
-        p.alignment = align
-        run = p.add_run(text)
-        run.font.name = font; run.font.size = fsize; run.bold = bold
-        tc = cell._tc; tcPr = tc.get_or_add_tcPr()
-        tcMar = _OE('w:tcMar')
-        for side in ['top','bottom','left','right']:
-            m = _OE(f'w:{side}'); m.set(_qn('w:w'),'80'); m.set(_qn('w:type'),'dxa')
-            tcMar.append(m)
-        tcPr.append(tcMar)
-        if bg:
-            shd = _OE('w:shd'); shd.set(_qn('w:val'),'clear')
-            shd.set(_qn('w:color'),'auto'); shd.set(_qn('w:fill'), bg)
-            tcPr.append(shd)
-
-    def _set_sym_widths(row):
-        for i, cell in enumerate(row.cells):
-            tc = cell._tc; tcPr = tc.get_or_add_tcPr()
-            tcW = _OE('w:tcW')
-            tcW.set(_qn('w:w'), str(col_w_sym[i])); tcW.set(_qn('w:type'),'dxa')
-            tcPr.append(tcW)
-
-    hdr = tbl.rows[0]; _set_sym_widths(hdr)
-    _sym_cell(hdr.cells[0], 'สัญลักษณ์', bold=True, align=WD_ALIGN_PARAGRAPH.CENTER, bg=HEADER_BG)
-    _sym_cell(hdr.cells[1], 'ความหมาย',  bold=True, align=WD_ALIGN_PARAGRAPH.CENTER, bg=HEADER_BG)
-    _sym_cell(hdr.cells[2], 'หน่วย',     bold=True, align=WD_ALIGN_PARAGRAPH.CENTER, bg=HEADER_BG)
+    hdr = tbl.rows[0]; _set_row_widths(hdr, col_w_sym)
+    _set_cell(hdr.cells[0], 'สัญลักษณ์', bold=True, align=WD_ALIGN_PARAGRAPH.CENTER, bg=HEADER_BG)
+    _set_cell(hdr.cells[1], 'ความหมาย',  bold=True, align=WD_ALIGN_PARAGRAPH.CENTER, bg=HEADER_BG)
+    _set_cell(hdr.cells[2], 'หน่วย',     bold=True, align=WD_ALIGN_PARAGRAPH.CENTER, bg=HEADER_BG)
 
     symbols = [
         ('W₁₈',  'จำนวนแกนเดี่ยว 18 kip ที่รองรับได้',              'ESALs'),
@@ -808,18 +881,19 @@ def _add_equation_section(doc):
         ('k',    'Modulus of Subgrade Reaction',                      'pci'),
     ]
     for sym, meaning, unit in symbols:
-        row = tbl.add_row(); _set_sym_widths(row)
+        row = tbl.add_row(); _set_row_widths(row, col_w_sym)
         # สัญลักษณ์ใช้ Times New Roman, ความหมาย/หน่วยใช้ TH SarabunPSK
-        _sym_cell(row.cells[0], sym,     font=EQ_FONT, fsize=EQ_SIZE, align=WD_ALIGN_PARAGRAPH.CENTER)
-        _sym_cell(row.cells[1], meaning, font=TH_FONT, fsize=TH_SIZE)
-        _sym_cell(row.cells[2], unit,    font=EQ_FONT, fsize=EQ_SIZE, align=WD_ALIGN_PARAGRAPH.CENTER)
+        _set_cell(row.cells[0], sym,     font=EQ_FONT, size=EQ_SIZE, align=WD_ALIGN_PARAGRAPH.CENTER)
+        _set_cell(row.cells[1], meaning, font=TH_FONT, size=TH_SIZE)
+        _set_cell(row.cells[2], unit,    font=EQ_FONT, size=EQ_SIZE, align=WD_ALIGN_PARAGRAPH.CENTER)
 
     doc.add_paragraph()
 
+_CBR_RE = re.compile(r'CBR\s+(\d+\.?\d*)\s*%')
+
 def _fmt_layer_name(name: str) -> str:
     """แทน 'CBR xx%' ด้วย 'CBR ≥ xx%' ในชื่อชั้นวัสดุ"""
-    import re
-    return re.sub(r'CBR\s+(\d+\.?\d*)\s*%', r'CBR ≥ \1%', name)
+    return _CBR_RE.sub(r'CBR ≥ \1%', name)
 
 def _add_esb_calculation(doc, layers_data, cbr_subgrade=3.0):
     """
@@ -827,12 +901,6 @@ def _add_esb_calculation(doc, layers_data, cbr_subgrade=3.0):
     สมการ: Times New Roman 11pt  |  ข้อความ/ตัวเลข: TH SarabunPSK 15pt
     ESB = (Σ hi × Ei^(1/3) / Σ hi)^3
     """
-    from docx.shared import Pt, Cm
-    from docx.enum.text import WD_ALIGN_PARAGRAPH
-    from docx.enum.table import WD_TABLE_ALIGNMENT
-    from docx.oxml.ns import qn
-    from docx.oxml import OxmlElement
-
     EQ_FONT = 'Times New Roman'
     EQ_SIZE = Pt(11)
     TH_FONT = _get_font_name()
@@ -840,9 +908,7 @@ def _add_esb_calculation(doc, layers_data, cbr_subgrade=3.0):
 
     def _vert(run, mode):
         rPr = run._r.get_or_add_rPr()
-        va = OxmlElement('w:vertAlign')
-        va.set(qn('w:val'), mode)
-        rPr.append(va)
+        _w_sub(rPr, 'vertAlign', val=mode)
 
     def _eq_run(p, text, sub=False, sup=False, bold=False):
         run = p.add_run(text)
@@ -862,24 +928,10 @@ def _add_esb_calculation(doc, layers_data, cbr_subgrade=3.0):
 
     def _cell_fmt(cell, bg=None):
         """padding + optional background"""
-        tc = cell._tc; tcPr = tc.get_or_add_tcPr()
-        tcMar = OxmlElement('w:tcMar')
-        for side in ['top','bottom','left','right']:
-            m = OxmlElement(f'w:{side}')
-            m.set(qn('w:w'), '80'); m.set(qn('w:type'), 'dxa')
-            tcMar.append(m)
-        tcPr.append(tcMar)
+        tcPr = cell._tc.get_or_add_tcPr()
+        _add_cell_margin(tcPr)
         if bg:
-            shd = OxmlElement('w:shd')
-            shd.set(qn('w:val'), 'clear'); shd.set(qn('w:color'), 'auto')
-            shd.set(qn('w:fill'), bg); tcPr.append(shd)
-
-    def _set_col_w(row, widths):
-        for i, cell in enumerate(row.cells):
-            tc = cell._tc; tcPr = tc.get_or_add_tcPr()
-            tcW = OxmlElement('w:tcW')
-            tcW.set(qn('w:w'), str(widths[i])); tcW.set(qn('w:type'), 'dxa')
-            tcPr.append(tcW)
+            _add_cell_shading(tcPr, bg)
 
     HEADER_BG = 'BDD7EE'
     SUM_BG    = 'FFF2CC'
@@ -937,22 +989,10 @@ def _add_esb_calculation(doc, layers_data, cbr_subgrade=3.0):
     tbl_sym.style = 'Table Grid'
     tbl_sym.alignment = WD_TABLE_ALIGNMENT.LEFT
 
-    def _sym_hdr(cell, text):
-        cell.text = ''
-        p = cell.paragraphs[0]; p.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        r = p.add_run(text); r.font.name = TH_FONT; r.font.size = TH_SIZE; r.bold = True
-        _cell_fmt(cell, bg=HEADER_BG)
-
-    def _sym_row(cell, text, align=WD_ALIGN_PARAGRAPH.LEFT, font=TH_FONT, fsize=None, bg=None):
-        cell.text = ''
-        p = cell.paragraphs[0]; p.alignment = align
-        r = p.add_run(text); r.font.name = font; r.font.size = fsize or TH_SIZE
-        _cell_fmt(cell, bg=bg)
-
-    hdr_s = tbl_sym.rows[0]; _set_col_w(hdr_s, cw_sym)
-    _sym_hdr(hdr_s.cells[0], 'สัญลักษณ์')
-    _sym_hdr(hdr_s.cells[1], 'ความหมาย')
-    _sym_hdr(hdr_s.cells[2], 'หน่วย')
+    hdr_s = tbl_sym.rows[0]; _set_row_widths(hdr_s, cw_sym)
+    _set_cell(hdr_s.cells[0], 'สัญลักษณ์', bold=True, align=WD_ALIGN_PARAGRAPH.CENTER, bg=HEADER_BG)
+    _set_cell(hdr_s.cells[1], 'ความหมาย', bold=True, align=WD_ALIGN_PARAGRAPH.CENTER, bg=HEADER_BG)
+    _set_cell(hdr_s.cells[2], 'หน่วย', bold=True, align=WD_ALIGN_PARAGRAPH.CENTER, bg=HEADER_BG)
 
     syms = [
         ('E_SB',  'Subbase Elastic Modulus เทียบเท่า',   'MPa'),
@@ -960,10 +1000,10 @@ def _add_esb_calculation(doc, layers_data, cbr_subgrade=3.0):
         ('E_i',   'Modulus of Elasticity ของแต่ละชั้น', 'MPa'),
     ]
     for sym, meaning, unit in syms:
-        row_s = tbl_sym.add_row(); _set_col_w(row_s, cw_sym)
-        _sym_row(row_s.cells[0], sym,     align=WD_ALIGN_PARAGRAPH.CENTER, font=EQ_FONT, fsize=EQ_SIZE)
-        _sym_row(row_s.cells[1], meaning)
-        _sym_row(row_s.cells[2], unit,    align=WD_ALIGN_PARAGRAPH.CENTER)
+        row_s = tbl_sym.add_row(); _set_row_widths(row_s, cw_sym)
+        _set_cell(row_s.cells[0], sym,     None, WD_ALIGN_PARAGRAPH.CENTER, font=EQ_FONT, size=EQ_SIZE)
+        _set_cell(row_s.cells[1], meaning, None)
+        _set_cell(row_s.cells[2], unit,    None, WD_ALIGN_PARAGRAPH.CENTER)
 
     doc.add_paragraph()
 
@@ -983,20 +1023,12 @@ def _add_esb_calculation(doc, layers_data, cbr_subgrade=3.0):
     tbl2.style = 'Table Grid'
     tbl2.alignment = WD_TABLE_ALIGNMENT.LEFT
 
-    def _td(cell, text, bold=False,
-            align=WD_ALIGN_PARAGRAPH.CENTER,
-            font=TH_FONT, fsize=None, bg=None):
-        """ตัวเลขและข้อความในตาราง — ใช้ TH SarabunPSK เป็น default"""
-        cell.text = ''
-        p = cell.paragraphs[0]; p.alignment = align
-        r = p.add_run(text)
-        r.font.name = font
-        r.font.size = fsize or TH_SIZE
-        r.bold = bold
-        _cell_fmt(cell, bg=bg)
+    def _td(cell, text, bold=False, align=WD_ALIGN_PARAGRAPH.CENTER, bg=None):
+        """ตัวเลขในตาราง — จัดกึ่งกลางเป็น default"""
+        _set_cell(cell, text, bold, align, bg)
 
     # Header — ชื่อคอลัมน์ใช้ TH Sarabun + superscript ใน Times NR
-    hdr2 = tbl2.rows[0]; _set_col_w(hdr2, cw2)
+    hdr2 = tbl2.rows[0]; _set_row_widths(hdr2, cw2)
 
     def _hdr_cell(cell, parts, bg=HEADER_BG):
         """parts = list of (text, font, size, sup, sub)"""
@@ -1034,7 +1066,7 @@ def _add_esb_calculation(doc, layers_data, cbr_subgrade=3.0):
         E13 = E ** (1/3)
         hE  = h * E13
         sum_h += h; sum_hE += hE
-        row2 = tbl2.add_row(); _set_col_w(row2, cw2)
+        row2 = tbl2.add_row(); _set_row_widths(row2, cw2)
         _td(row2.cells[0], str(idx))
         _td(row2.cells[1], _fmt_layer_name(layer.get('name','')),
             align=WD_ALIGN_PARAGRAPH.LEFT)
@@ -1044,7 +1076,7 @@ def _add_esb_calculation(doc, layers_data, cbr_subgrade=3.0):
         _td(row2.cells[5], f'{hE:,.2f}')
 
     # แถวรวม
-    row_sum = tbl2.add_row(); _set_col_w(row_sum, cw2)
+    row_sum = tbl2.add_row(); _set_row_widths(row_sum, cw2)
     _td(row_sum.cells[0], '',        bg=SUM_BG)
     _td(row_sum.cells[1], 'รวม (\u03a3)', bold=True,
         align=WD_ALIGN_PARAGRAPH.RIGHT, bg=SUM_BG)
@@ -1089,84 +1121,39 @@ def _add_layer_table(doc, layers_data, d_cm, pavement_type, fig_caption="",
     คอลัมน์: ลำดับ | ชนิดวัสดุ | ความหนา (ซม.) | Modulus E (MPa)
     Header สีฟ้าอ่อน, แถวข้อมูล justify ซ้าย, ตัวเลข center
     """
-    from docx.shared import Pt, Inches, Cm
-    from docx.enum.text import WD_ALIGN_PARAGRAPH
-    from docx.enum.table import WD_TABLE_ALIGNMENT
-    from docx.oxml.ns import qn
-    from docx.oxml import OxmlElement
-
     HEADER_BG = "BDD7EE"
     FONT = _get_font_name()
     FS = Pt(15)
 
-    def _sc(cell, text, bold=False,
-            align=WD_ALIGN_PARAGRAPH.LEFT, bg=None):
-        """set cell content"""
-        cell.text = ''
-        p = cell.paragraphs[0]
-        p.alignment = align
-        run = p.add_run(text)
-        run.font.name = FONT
-        run.font.size = FS
-        run.bold = bold
-        # cell padding
-        tc = cell._tc
-        tcPr = tc.get_or_add_tcPr()
-        tcMar = OxmlElement('w:tcMar')
-        for side in ['top', 'bottom', 'left', 'right']:
-            m = OxmlElement(f'w:{side}')
-            m.set(qn('w:w'), '80')
-            m.set(qn('w:type'), 'dxa')
-            tcMar.append(m)
-        tcPr.append(tcMar)
-        if bg:
-            shd = OxmlElement('w:shd')
-            shd.set(qn('w:val'), 'clear')
-            shd.set(qn('w:color'), 'auto')
-            shd.set(qn('w:fill'), bg)
-            tcPr.append(shd)
-
     # กว้างคอลัมน์ (DXA): ลำดับ | ชนิดวัสดุ | ความหนา | Modulus E
     col_w = [756, 4536, 1728, 2052]
-    tbl = doc.add_table(rows=1, cols=4)
+    tbl = doc.add_table(rows=0, cols=4)
     tbl.style = 'Table Grid'
     tbl.alignment = WD_TABLE_ALIGNMENT.LEFT
 
     # ตั้งความกว้างตาราง
-    from docx.oxml import OxmlElement as _OE
     tbl_xml = tbl._tbl
     tbl_pr = tbl_xml.find(qn('w:tblPr'))
     if tbl_pr is None:
-        tbl_pr = _OE('w:tblPr')
+        tbl_pr = OxmlElement('w:tblPr')
         tbl_xml.insert(0, tbl_pr)
-    tbl_w = OxmlElement('w:tblW')
-    tbl_w.set(qn('w:w'), str(sum(col_w)))
-    tbl_w.set(qn('w:type'), 'dxa')
-    tbl_pr.append(tbl_w)
-
-    def _set_col_widths(row):
-        for i, cell in enumerate(row.cells):
-            tc = cell._tc
-            tcPr = tc.get_or_add_tcPr()
-            tcW = OxmlElement('w:tcW')
-            tcW.set(qn('w:w'), str(col_w[i]))
-            tcW.set(qn('w:type'), 'dxa')
-            tcPr.append(tcW)
+    _w_sub(tbl_pr, 'tblW', w=str(sum(col_w)), type='dxa')
+
+    CENTER = WD_ALIGN_PARAGRAPH.CENTER
+
+    def _cx(i, text, bold=False, align=WD_ALIGN_PARAGRAPH.LEFT, bg=None):
+        """XML ของเซลล์คอลัมน์ i"""
+        return _table_cell_xml(col_w[i], _cell_paragraph_xml(text, FONT, FS, bold, align), bg)
 
     # Header
-    hdr = tbl.rows[0]
-    _set_col_widths(hdr)
-    _sc(hdr.cells[0], 'ลำดับ',          bold=True, align=WD_ALIGN_PARAGRAPH.CENTER, bg=HEADER_BG)
-    _sc(hdr.cells[1], 'ชนิดวัสดุ',      bold=True, align=WD_ALIGN_PARAGRAPH.CENTER, bg=HEADER_BG)
-    _sc(hdr.cells[2], 'ความหนา (ซม.)',  bold=True, align=WD_ALIGN_PARAGRAPH.CENTER, bg=HEADER_BG)
-    _sc(hdr.cells[3], 'Modulus E (MPa)', bold=True, align=WD_ALIGN_PARAGRAPH.CENTER, bg=HEADER_BG)
+    rows = [[_cx(i, h, bold=True, align=CENTER, bg=HEADER_BG) for i, h in enumerate(
+        ('ลำดับ', 'ชนิดวัสดุ', 'ความหนา (ซม.)', 'Modulus E (MPa)'))]]
 
     # แถวที่ 1: คอนกรีต
-    row = tbl.add_row(); _set_col_widths(row)
-    _sc(row.cells[0], '1',  align=WD_ALIGN_PARAGRAPH.CENTER)
-    _sc(row.cells[1], f'ผิวทางคอนกรีต {pavement_type}')
-    _sc(row.cells[2], str(d_cm), align=WD_ALIGN_PARAGRAPH.CENTER)
-    _sc(row.cells[3], '-',       align=WD_ALIGN_PARAGRAPH.CENTER)
+    rows.append([_cx(0, '1', align=CENTER),
+                 _cx(1, f'ผิวทางคอนกรีต {pavement_type}'),
+                 _cx(2, str(d_cm), align=CENTER),
+                 _cx(3, '-', align=CENTER)])
 
     # แถวชั้นวัสดุ
     row_num = 2
@@ -1175,22 +1162,20 @@ def _add_layer_table(doc, layers_data, d_cm, pavement_type, fig_caption="",
         if thick <= 0:
             continue
         e_mpa = layer.get('E_MPa', 0)
-        row = tbl.add_row(); _set_col_widths(row)
-        _sc(row.cells[0], str(row_num), align=WD_ALIGN_PARAGRAPH.CENTER)
-        _sc(row.cells[1], _fmt_layer_name(layer.get('name', '')))
-        _sc(row.cells[2], str(thick),   align=WD_ALIGN_PARAGRAPH.CENTER)
-        _sc(row.cells[3], f"{e_mpa:,}" if e_mpa > 0 else '-',
-            align=WD_ALIGN_PARAGRAPH.CENTER)
+        rows.append([_cx(0, str(row_num), align=CENTER),
+                     _cx(1, _fmt_layer_name(layer.get('name', ''))),
+                     _cx(2, str(thick), align=CENTER),
+                     _cx(3, f"{e_mpa:,}" if e_mpa > 0 else '-', align=CENTER)])
         row_num += 1
 
     # แถว Subgrade
-    row = tbl.add_row(); _set_col_widths(row)
-    _sc(row.cells[0], str(row_num),          align=WD_ALIGN_PARAGRAPH.CENTER)
-    _sc(row.cells[1], 'ดินคันทาง')
     mr_psi = int(1500 * cbr_subgrade if cbr_subgrade < 10 else 1000 + 555 * cbr_subgrade)
     mr_mpa = round(mr_psi / 145.038)
-    _sc(row.cells[2], f'CBR \u2265 {cbr_subgrade:.1f} %', align=WD_ALIGN_PARAGRAPH.CENTER)
-    _sc(row.cells[3], f'{mr_mpa:,} ({mr_psi:,} psi)', align=WD_ALIGN_PARAGRAPH.CENTER)
+    rows.append([_cx(0, str(row_num), align=CENTER),
+                 _cx(1, 'ดินคันทาง'),
+                 _cx(2, f'CBR \u2265 {cbr_subgrade:.1f} %', align=CENTER),
+                 _cx(3, f'{mr_mpa:,} ({mr_psi:,} psi)', align=CENTER)])
+    _append_table_rows(tbl, rows)
 
     doc.add_paragraph()
 
@@ -1199,16 +1184,11 @@ def _add_layer_table(doc, layers_data, d_cm, pavement_type, fig_caption="",
 
     # รูปตัดขวาง (แสดงเฉพาะเมื่อ show_figure=True)
     if show_figure:
-        fig = create_pavement_structure_figure(layers_data, d_cm)
-        if fig:
-            img_buf = BytesIO()
-            fig.savefig(img_buf, format='png', dpi=150,
-                        bbox_inches='tight', facecolor='white')
-            img_buf.seek(0)
+        png = build_structure_png(structure_layers_key(layers_data), d_cm, WORD_FIGURE_DPI)
+        if png:
             p_img = doc.add_paragraph()
             p_img.alignment = WD_ALIGN_PARAGRAPH.CENTER
-            p_img.add_run().add_picture(img_buf, width=Inches(4.5))
-            plt.close(fig)
+            p_img.add_run().add_picture(BytesIO(png), width=Inches(4.5))
 
         if fig_caption:
             p_cap = doc.add_paragraph()
@@ -1223,33 +1203,10 @@ def _add_layer_table(doc, layers_data, d_cm, pavement_type, fig_caption="",
 def _add_kvalue_section(doc, params, img1_bytes=None, img2_bytes=None,
                         fig_prefix='4-', fig_num_start=4):
     """การคำนวณ k-value (Nomograph) พร้อม caption ใต้รูป"""
-    from docx.shared import Pt, Inches
-    from docx.enum.text import WD_ALIGN_PARAGRAPH
-    from docx.enum.table import WD_TABLE_ALIGNMENT
-
     FONT = _get_font_name()
     FS   = Pt(15)
     HEADER_BG = 'BDD7EE'
 
-    def _sc(cell, text, bold=False, align=WD_ALIGN_PARAGRAPH.LEFT, bg=None):
-        from docx.oxml.ns import qn
-        from docx.oxml import OxmlElement
-        cell.text = ''
-        p = cell.paragraphs[0]; p.alignment = align
-        run = p.add_run(text)
-        run.font.name = FONT; run.font.size = FS; run.bold = bold
-        tc = cell._tc; tcPr = tc.get_or_add_tcPr()
-        tcMar = OxmlElement('w:tcMar')
-        for side in ['top','bottom','left','right']:
-            m = OxmlElement(f'w:{side}')
-            m.set(qn('w:w'),'80'); m.set(qn('w:type'),'dxa')
-            tcMar.append(m)
-        tcPr.append(tcMar)
-        if bg:
-            shd = OxmlElement('w:shd')
-            shd.set(qn('w:val'),'clear'); shd.set(qn('w:color'),'auto')
-            shd.set(qn('w:fill'), bg); tcPr.append(shd)
-
     def _add_fig_caption(text):
         p = doc.add_paragraph()
         p.alignment = WD_ALIGN_PARAGRAPH.CENTER
@@ -1264,18 +1221,10 @@ def _add_kvalue_section(doc, params, img1_bytes=None, img2_bytes=None,
     tbl1.style = 'Table Grid'
     tbl1.alignment = WD_TABLE_ALIGNMENT.LEFT
 
-    def _set_w(row, widths):
-        from docx.oxml.ns import qn; from docx.oxml import OxmlElement
-        for i, cell in enumerate(row.cells):
-            tc = cell._tc; tcPr = tc.get_or_add_tcPr()
-            tcW = OxmlElement('w:tcW')
-            tcW.set(qn('w:w'), str(widths[i])); tcW.set(qn('w:type'),'dxa')
-            tcPr.append(tcW)
-
-    hdr = tbl1.rows[0]; _set_w(hdr, col_w1)
-    _sc(hdr.cells[0], 'พารามิเตอร์', bold=True, align=WD_ALIGN_PARAGRAPH.CENTER, bg=HEADER_BG)
-    _sc(hdr.cells[1], 'ค่า',         bold=True, align=WD_ALIGN_PARAGRAPH.CENTER, bg=HEADER_BG)
-    _sc(hdr.cells[2], 'หน่วย',       bold=True, align=WD_ALIGN_PARAGRAPH.CENTER, bg=HEADER_BG)
+    hdr = tbl1.rows[0]; _set_row_widths(hdr, col_w1)
+    _set_cell(hdr.cells[0], 'พารามิเตอร์', bold=True, align=WD_ALIGN_PARAGRAPH.CENTER, bg=HEADER_BG)
+    _set_cell(hdr.cells[1], 'ค่า',         bold=True, align=WD_ALIGN_PARAGRAPH.CENTER, bg=HEADER_BG)
+    _set_cell(hdr.cells[2], 'หน่วย',       bold=True, align=WD_ALIGN_PARAGRAPH.CENTER, bg=HEADER_BG)
 
     for p_name, val, unit in [
         ('Roadbed Soil Resilient Modulus (MR)', f"{params.get('MR',0):,.0f}", 'psi'),
@@ -1283,10 +1232,10 @@ def _add_kvalue_section(doc, params, img1_bytes=None, img2_bytes=None,
         ('Subbase Thickness (DSB)',              f"{params.get('DSB',0):.1f}", 'inches'),
         ('Composite Modulus k∞',                f"{params.get('k_inf',0):,.0f}",'pci'),
     ]:
-        row = tbl1.add_row(); _set_w(row, col_w1)
-        _sc(row.cells[0], p_name)
-        _sc(row.cells[1], val,  align=WD_ALIGN_PARAGRAPH.CENTER)
-        _sc(row.cells[2], unit, align=WD_ALIGN_PARAGRAPH.CENTER)
+        row = tbl1.add_row(); _set_row_widths(row, col_w1)
+        _set_cell(row.cells[0], p_name)
+        _set_cell(row.cells[1], val,  align=WD_ALIGN_PARAGRAPH.CENTER)
+        _set_cell(row.cells[2], unit, align=WD_ALIGN_PARAGRAPH.CENTER)
 
     if img1_bytes:
         doc.add_paragraph()
@@ -1307,20 +1256,20 @@ def _add_kvalue_section(doc, params, img1_bytes=None, img2_bytes=None,
     tbl2.style = 'Table Grid'
     tbl2.alignment = WD_TABLE_ALIGNMENT.LEFT
 
-    hdr2 = tbl2.rows[0]; _set_w(hdr2, col_w2)
-    _sc(hdr2.cells[0], 'พารามิเตอร์', bold=True, align=WD_ALIGN_PARAGRAPH.CENTER, bg=HEADER_BG)
-    _sc(hdr2.cells[1], 'ค่า',         bold=True, align=WD_ALIGN_PARAGRAPH.CENTER, bg=HEADER_BG)
-    _sc(hdr2.cells[2], 'หน่วย',       bold=True, align=WD_ALIGN_PARAGRAPH.CENTER, bg=HEADER_BG)
+    hdr2 = tbl2.rows[0]; _set_row_widths(hdr2, col_w2)
+    _set_cell(hdr2.cells[0], 'พารามิเตอร์', bold=True, align=WD_ALIGN_PARAGRAPH.CENTER, bg=HEADER_BG)
+    _set_cell(hdr2.cells[1], 'ค่า',         bold=True, align=WD_ALIGN_PARAGRAPH.CENTER, bg=HEADER_BG)
+    _set_cell(hdr2.cells[2], 'หน่วย',       bold=True, align=WD_ALIGN_PARAGRAPH.CENTER, bg=HEADER_BG)
 
     for p_name, val, unit in [
         ('Effective Modulus k∞ (จาก Step 1)',  f"{params.get('k_inf',0):,.0f}",      'pci'),
         ('Loss of Support Factor (LS)',          f"{params.get('LS_factor',0):.1f}",  '-'),
         ('Corrected Modulus k (ที่ใช้ออกแบบ)', f"{params.get('k_corrected',0):,.0f}",'pci'),
     ]:
-        row = tbl2.add_row(); _set_w(row, col_w2)
-        _sc(row.cells[0], p_name)
-        _sc(row.cells[1], val,  align=WD_ALIGN_PARAGRAPH.CENTER)
-        _sc(row.cells[2], unit, align=WD_ALIGN_PARAGRAPH.CENTER)
+        row = tbl2.add_row(); _set_row_widths(row, col_w2)
+        _set_cell(row.cells[0], p_name)
+        _set_cell(row.cells[1], val,  align=WD_ALIGN_PARAGRAPH.CENTER)
+        _set_cell(row.cells[2], unit, align=WD_ALIGN_PARAGRAPH.CENTER)
 
     if img2_bytes:
         doc.add_paragraph()
@@ -1338,50 +1287,10 @@ def _add_kvalue_section(doc, params, img1_bytes=None, img2_bytes=None,
 def _add_design_result_section(doc, inputs, calculated_values, comparison_results,
                                 selected_d_cm, main_result, layers_data, subgrade_info):
     """ตารางผลการคำนวณออกแบบ — รูปแบบตามภาพตัวอย่าง"""
-    from docx.shared import Pt
-    from docx.enum.table import WD_TABLE_ALIGNMENT
-    from docx.enum.text import WD_ALIGN_PARAGRAPH
-    from docx.oxml.ns import qn
-    from docx.oxml import OxmlElement
-
     HEADER_BG = "BDD7EE"
     FONT = _get_font_name()
     FS = Pt(15)
 
-    def _sc(cell, text, bold=False,
-            align=WD_ALIGN_PARAGRAPH.LEFT, bg=None):
-        cell.text = ''
-        p = cell.paragraphs[0]
-        p.alignment = align
-        run = p.add_run(text)
-        run.font.name = FONT
-        run.font.size = FS
-        run.bold = bold
-        tc = cell._tc
-        tcPr = tc.get_or_add_tcPr()
-        tcMar = OxmlElement('w:tcMar')
-        for side in ['top', 'bottom', 'left', 'right']:
-            m = OxmlElement(f'w:{side}')
-            m.set(qn('w:w'), '80')
-            m.set(qn('w:type'), 'dxa')
-            tcMar.append(m)
-        tcPr.append(tcMar)
-        if bg:
-            shd = OxmlElement('w:shd')
-            shd.set(qn('w:val'), 'clear')
-            shd.set(qn('w:color'), 'auto')
-            shd.set(qn('w:fill'), bg)
-            tcPr.append(shd)
-
-    def _set_col_widths(row, widths):
-        for i, cell in enumerate(row.cells):
-            tc = cell._tc
-            tcPr = tc.get_or_add_tcPr()
-            tcW = OxmlElement('w:tcW')
-            tcW.set(qn('w:w'), str(widths[i]))
-            tcW.set(qn('w:type'), 'dxa')
-            tcPr.append(tcW)
-
     # ── หัวข้อ "ข้อมูลนำเข้าการออกแบบ:" (bold underline) ─────────────
     p_lbl = doc.add_paragraph()
     run_lbl = p_lbl.add_run('ข้อมูลนำเข้าการออกแบบ:')
@@ -1397,9 +1306,9 @@ def _add_design_result_section(doc, inputs, calculated_values, comparison_result
     tbl_in.alignment = WD_TABLE_ALIGNMENT.LEFT
 
     hdr = tbl_in.rows[0]
-    _set_col_widths(hdr, col_w_in)
+    _set_row_widths(hdr, col_w_in)
     for i, t in enumerate(['พารามิเตอร์', 'สัญลักษณ์', 'ค่า', 'หน่วย']):
-        _sc(hdr.cells[i], t, bold=True,
+        _set_cell(hdr.cells[i], t, bold=True,
             align=WD_ALIGN_PARAGRAPH.CENTER, bg=HEADER_BG)
 
     delta_psi = calculated_values.get('delta_psi', 4.5 - inputs['pt'])
@@ -1423,11 +1332,11 @@ def _add_design_result_section(doc, inputs, calculated_values, comparison_result
     ]
     for row_data in input_rows:
         row = tbl_in.add_row()
-        _set_col_widths(row, col_w_in)
-        _sc(row.cells[0], row_data[0])
-        _sc(row.cells[1], row_data[1], align=WD_ALIGN_PARAGRAPH.CENTER)
-        _sc(row.cells[2], row_data[2], align=WD_ALIGN_PARAGRAPH.CENTER)
-        _sc(row.cells[3], row_data[3], align=WD_ALIGN_PARAGRAPH.CENTER)
+        _set_row_widths(row, col_w_in)
+        _set_cell(row.cells[0], row_data[0])
+        _set_cell(row.cells[1], row_data[1], align=WD_ALIGN_PARAGRAPH.CENTER)
+        _set_cell(row.cells[2], row_data[2], align=WD_ALIGN_PARAGRAPH.CENTER)
+        _set_cell(row.cells[3], row_data[3], align=WD_ALIGN_PARAGRAPH.CENTER)
 
     doc.add_paragraph()
 
@@ -1445,38 +1354,39 @@ def _add_design_result_section(doc, inputs, calculated_values, comparison_result
     tbl_res.alignment = WD_TABLE_ALIGNMENT.LEFT
 
     hdr2 = tbl_res.rows[0]
-    _set_col_widths(hdr2, col_w_res)
+    _set_row_widths(hdr2, col_w_res)
     for i, t in enumerate(['D (ซม.)', 'D (นิ้ว)', 'log₁₀(W₁₈)',
                             'W₁₈ รองรับได้', 'อัตราส่วน', 'ผล']):
-        _sc(hdr2.cells[i], t, bold=True,
+        _set_cell(hdr2.cells[i], t, bold=True,
             align=WD_ALIGN_PARAGRAPH.CENTER, bg=HEADER_BG)
 
-    for r in comparison_results:
-        is_sel = (r['d_cm'] == selected_d_cm)
+    # จัดรูปแบบตัวเลขทั้งคอลัมน์ครั้งเดียว แล้ววนเขียนเซลล์อย่างเดียว
+    d_cm_arr, d_inch_arr, log_arr, w18_arr, ratio_arr = (
+        np.array([r[k] for r in comparison_results], dtype=float)
+        for k in ('d_cm', 'd_inch', 'log_w18', 'w18', 'ratio'))
+    is_sel_mask = d_cm_arr == selected_d_cm
+    row_texts = zip(np.char.mod('%.0f', d_cm_arr), np.char.mod('%.0f', d_inch_arr),
+                    np.char.mod('%.4f', log_arr), [f"{w:,.0f}" for w in w18_arr],
+                    np.char.mod('%.2f', ratio_arr))
+    passed_flags = [r['passed'] for r in comparison_results]
+
+    for texts, is_sel, ok in zip(row_texts, is_sel_mask.tolist(), passed_flags):
         bg_row = 'FFFFAA' if is_sel else None
-        bg_res = 'CCFFCC' if r['passed'] else 'FFCCCC'
         row = tbl_res.add_row()
-        _set_col_widths(row, col_w_res)
-        _sc(row.cells[0], f"{r['d_cm']:.0f}",    bold=is_sel,
-            align=WD_ALIGN_PARAGRAPH.CENTER, bg=bg_row)
-        _sc(row.cells[1], f"{r['d_inch']:.0f}",
-            align=WD_ALIGN_PARAGRAPH.CENTER, bg=bg_row)
-        _sc(row.cells[2], f"{r['log_w18']:.4f}",
-            align=WD_ALIGN_PARAGRAPH.CENTER, bg=bg_row)
-        _sc(row.cells[3], f"{r['w18']:,.0f}",
-            align=WD_ALIGN_PARAGRAPH.CENTER, bg=bg_row)
-        _sc(row.cells[4], f"{r['ratio']:.2f}",
-            align=WD_ALIGN_PARAGRAPH.CENTER, bg=bg_row)
-        _sc(row.cells[5], "ผ่าน ✓" if r['passed'] else "ไม่ผ่าน ✗",
-            align=WD_ALIGN_PARAGRAPH.CENTER, bg=bg_res)
+        _set_row_widths(row, col_w_res)
+        cells = row.cells
+        for i, text in enumerate(texts):
+            _set_cell(cells[i], text, bold=is_sel and i == 0,
+                      align=WD_ALIGN_PARAGRAPH.CENTER, bg=bg_row)
+        _set_cell(cells[5], "ผ่าน ✓" if ok else "ไม่ผ่าน ✗",
+                  align=WD_ALIGN_PARAGRAPH.CENTER, bg='CCFFCC' if ok else 'FFCCCC')
 
     doc.add_paragraph()
 
     # ── สรุปผล ────────────────────────────────────────────────────────
     passed, ratio = main_result
     sel_inch = round(selected_d_cm / 2.54)
-    w18_cap  = next((r['w18'] for r in comparison_results
-                     if r['d_cm'] == selected_d_cm), 0)
+    w18_cap  = w18_arr[is_sel_mask][0] if is_sel_mask.any() else 0
 
     p_lbl3 = doc.add_paragraph()
     run_lbl3 = p_lbl3.add_run('สรุปผลการออกแบบ:')
@@ -1519,118 +1429,57 @@ def _add_summary_layer_table(doc, layers_data, d_cm, pavement_type,
       └──────┴──────────────────────────┴──────────────┘
       Caption: รูปที่ X-X  โครงสร้างชั้นทาง... (bold underline center)
     """
-    from docx.shared import Pt, Inches
-    from docx.enum.text import WD_ALIGN_PARAGRAPH
-    from docx.enum.table import WD_TABLE_ALIGNMENT
-    from docx.oxml.ns import qn
-    from docx.oxml import OxmlElement
-
     HEADER_BG = 'BDD7EE'
     FONT  = _get_font_name()
     FS    = Pt(15)
     col_w = [934, 6004, 2134]   # ลำดับ | ชนิดวัสดุ | ความหนา  (9072 DXA = เต็มหน้า)
 
-    def _qset(el, attr, val):
-        el.set(qn(attr), val)
-
-    def _set_widths(row):
-        for i, cell in enumerate(row.cells):
-            tc = cell._tc; tcPr = tc.get_or_add_tcPr()
-            tcW = OxmlElement('w:tcW')
-            _qset(tcW, 'w:w', str(col_w[i])); _qset(tcW, 'w:type', 'dxa')
-            tcPr.append(tcW)
-
-    def _cell_margin(cell):
-        tc = cell._tc; tcPr = tc.get_or_add_tcPr()
-        tcMar = OxmlElement('w:tcMar')
-        for side in ['top','bottom','left','right']:
-            m = OxmlElement(f'w:{side}')
-            _qset(m, 'w:w', '80'); _qset(m, 'w:type', 'dxa')
-            tcMar.append(m)
-        tcPr.append(tcMar)
-
-    def _bg(cell, color):
-        tc = cell._tc; tcPr = tc.get_or_add_tcPr()
-        shd = OxmlElement('w:shd')
-        _qset(shd, 'w:val', 'clear'); _qset(shd, 'w:color', 'auto')
-        _qset(shd, 'w:fill', color); tcPr.append(shd)
-
-    def _sc(cell, text, bold=False,
-            align=WD_ALIGN_PARAGRAPH.LEFT, bg_color=None):
-        cell.text = ''
-        p = cell.paragraphs[0]; p.alignment = align
-        run = p.add_run(text)
-        run.font.name = FONT; run.font.size = FS; run.bold = bold
-        _cell_margin(cell)
-        if bg_color: _bg(cell, bg_color)
+    CENTER = WD_ALIGN_PARAGRAPH.CENTER
 
-    def _merge_row_3col(tbl):
-        """เพิ่มแถวและ merge 3 คอลัมน์"""
-        row = tbl.add_row()
-        a, b, c = row.cells
-        a.merge(c)
-        return row
+    def _cx(i, text, bold=False, align=WD_ALIGN_PARAGRAPH.LEFT, bg_color=None):
+        """XML ของเซลล์คอลัมน์ i"""
+        return _table_cell_xml(col_w[i], _cell_paragraph_xml(text, FONT, FS, bold, align), bg_color)
 
     # ── สร้างตาราง ──────────────────────────────────────────────────────
     # นับจำนวนชั้นที่มีความหนา > 0
     valid_layers = [l for l in layers_data if l.get('thickness_cm', 0) > 0]
     # แถว: header + คอนกรีต + ชั้นวัสดุ + merge(รูป) + subgrade
-    tbl = doc.add_table(rows=1, cols=3)
+    tbl = doc.add_table(rows=0, cols=3)
     tbl.style = 'Table Grid'
     tbl.alignment = WD_TABLE_ALIGNMENT.LEFT
 
     # ── Header ──────────────────────────────────────────────────────────
-    hdr = tbl.rows[0]; _set_widths(hdr)
-    _sc(hdr.cells[0], 'ลำดับ',         bold=True,
-        align=WD_ALIGN_PARAGRAPH.CENTER, bg_color=HEADER_BG)
-    _sc(hdr.cells[1], 'ชนิดวัสดุ',    bold=True,
-        align=WD_ALIGN_PARAGRAPH.CENTER, bg_color=HEADER_BG)
-    _sc(hdr.cells[2], 'ความหนา (ซม.)', bold=True,
-        align=WD_ALIGN_PARAGRAPH.CENTER, bg_color=HEADER_BG)
+    rows = [[_cx(i, h, bold=True, align=CENTER, bg_color=HEADER_BG)
+             for i, h in enumerate(('ลำดับ', 'ชนิดวัสดุ', 'ความหนา (ซม.)'))]]
 
     # ── แถวคอนกรีต ──────────────────────────────────────────────────────
-    row = tbl.add_row(); _set_widths(row)
-    _sc(row.cells[0], '1',  align=WD_ALIGN_PARAGRAPH.CENTER)
-    _sc(row.cells[1], f'ผิวทางคอนกรีต {pavement_type}')
-    _sc(row.cells[2], str(d_cm), align=WD_ALIGN_PARAGRAPH.CENTER)
+    rows.append([_cx(0, '1', align=CENTER),
+                 _cx(1, f'ผิวทางคอนกรีต {pavement_type}'),
+                 _cx(2, str(d_cm), align=CENTER)])
 
     # ── แถวชั้นวัสดุ ─────────────────────────────────────────────────────
     row_num = 2
     for layer in valid_layers:
-        row = tbl.add_row(); _set_widths(row)
-        _sc(row.cells[0], str(row_num), align=WD_ALIGN_PARAGRAPH.CENTER)
-        _sc(row.cells[1], _fmt_layer_name(layer.get('name', '')))
-        _sc(row.cells[2], str(layer.get('thickness_cm', 0)),
-            align=WD_ALIGN_PARAGRAPH.CENTER)
+        rows.append([_cx(0, str(row_num), align=CENTER),
+                     _cx(1, _fmt_layer_name(layer.get('name', ''))),
+                     _cx(2, str(layer.get('thickness_cm', 0)), align=CENTER)])
         row_num += 1
 
-    # ── แถว merge — รูปตัดขวาง ──────────────────────────────────────────
-    fig = create_pavement_structure_figure(valid_layers, d_cm)
-    merged_row = _merge_row_3col(tbl)
-    merged_cell = merged_row.cells[0]
-    # ตั้ง width ของ merged cell = ผลรวมทั้งหมด
-    tc = merged_cell._tc; tcPr = tc.get_or_add_tcPr()
-    tcW = OxmlElement('w:tcW')
-    _qset(tcW, 'w:w', str(sum(col_w))); _qset(tcW, 'w:type', 'dxa')
-    tcPr.append(tcW)
-    _cell_margin(merged_cell)
-
-    p_fig = merged_cell.paragraphs[0]
-    p_fig.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    if fig:
-        img_buf = BytesIO()
-        fig.savefig(img_buf, format='png', dpi=150,
-                    bbox_inches='tight', facecolor='white')
-        img_buf.seek(0)
-        p_fig.add_run().add_picture(img_buf, width=Inches(4.2))
-        plt.close(fig)
+    # ── แถว merge — รูปตัดขวาง (gridSpan 3 คอลัมน์, กว้าง = ผลรวมทั้งหมด) ──
+    fig_row_idx = len(rows)
+    rows.append([_table_cell_xml(sum(col_w), '<w:p><w:pPr><w:jc w:val="center"/></w:pPr></w:p>',
+                                 span=len(col_w))])
 
     # ── แถว Subgrade ────────────────────────────────────────────────────
-    row = tbl.add_row(); _set_widths(row)
-    _sc(row.cells[0], str(row_num), align=WD_ALIGN_PARAGRAPH.CENTER)
-    _sc(row.cells[1], 'ดินคันทาง')
-    _sc(row.cells[2], f'CBR \u2265 {cbr_subgrade:.1f} %',
-        align=WD_ALIGN_PARAGRAPH.CENTER)
+    rows.append([_cx(0, str(row_num), align=CENTER),
+                 _cx(1, 'ดินคันทาง'),
+                 _cx(2, f'CBR \u2265 {cbr_subgrade:.1f} %', align=CENTER)])
+    _append_table_rows(tbl, rows)
+
+    png = build_structure_png(structure_layers_key(valid_layers), d_cm, WORD_FIGURE_DPI)
+    if png:
+        p_fig = tbl.rows[fig_row_idx].cells[0].paragraphs[0]
+        p_fig.add_run().add_picture(BytesIO(png), width=Inches(4.2))
 
     # ── Caption ──────────────────────────────────────────────────────────
     if fig_caption:
@@ -1683,12 +1532,9 @@ def create_full_word_report(
 
     # ตัวเลือกเพิ่มเติม
     include_summary_section,
+    timestamp=None,        # เวลาที่สร้างรายงาน (None = ตอนนี้)
 ):
-    try:
-        from docx import Document
-        from docx.shared import Pt, Inches
-        from docx.enum.text import WD_ALIGN_PARAGRAPH
-    except ImportError:
+    if not DOCX_AVAILABLE:
         return None, "กรุณาติดตั้ง python-docx: pip install python-docx"
 
     doc = Document()
@@ -1702,9 +1548,6 @@ def create_full_word_report(
         return n
 
     # ── หน้าปก ──────────────────────────────────────────────────────────
-    from docx.enum.text import WD_ALIGN_PARAGRAPH
-    from docx.shared import Pt
-
     p_title = doc.add_paragraph()
     p_title.alignment = WD_ALIGN_PARAGRAPH.CENTER
     run_title = p_title.add_run('รายการคำนวณออกแบบ\nผิวทางคอนกรีต')
@@ -1730,7 +1573,7 @@ def create_full_word_report(
     doc.add_paragraph()
     p_date = doc.add_paragraph()
     p_date.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    r = p_date.add_run(f'วันที่: {datetime.now().strftime("%d/%m/%Y")}')
+    r = p_date.add_run(f'วันที่: {(timestamp or datetime.now()):%d/%m/%Y}')
     r.font.name = _get_font_name()
     r.font.size = Pt(15)
 
@@ -1838,8 +1681,7 @@ def create_full_word_report(
 
     buffer = BytesIO()
     doc.save(buffer)
-    buffer.seek(0)
-    return buffer, None
+    return buffer.getvalue(), None
 
 
 # ============================================================
@@ -2238,14 +2080,14 @@ def render_tab_calculator():
         st.divider()
 
         # ── รูปโครงสร้าง ──────────────────────────────────────────────────────
-        fig_structure = create_pavement_structure_figure(layers_data, d_cm_selected)
-        if fig_structure:
-            st.pyplot(fig_structure)
-            img_buf = save_figure_to_bytes(fig_structure)
-            st.download_button("📥 ดาวน์โหลดรูปโครงสร้าง", img_buf,
+        # PNG ถูก cache ตามข้อมูลชั้นทาง ใช้ทั้งแสดงผลและปุ่มดาวน์โหลด (รายงาน Word ใช้ฉบับ WORD_FIGURE_DPI)
+        layers_key = structure_layers_key(layers_data)
+        structure_png = build_structure_png(layers_key, d_cm_selected)
+        if structure_png:
+            st.image(structure_png, use_container_width=True)
+            st.download_button("📥 ดาวน์โหลดรูปโครงสร้าง", structure_png,
                                f"pavement_structure_{datetime.now().strftime('%Y%m%d_%H%M')}.png",
                                "image/png")
-            plt.close(fig_structure)
 
         st.divider()
 
@@ -2255,21 +2097,22 @@ def render_tab_calculator():
                 st.error("กรุณาติดตั้ง python-docx: pip install python-docx")
             else:
                 with st.spinner("กำลังสร้างรายงาน..."):
+                    export_ts    = datetime.now()  # เวลาเดียวกันทั้งในรายงานและชื่อไฟล์
                     inputs_dict  = {'w18_design': w18_design, 'pt': pt, 'reliability': reliability,
                                     'so': so, 'k_eff': k_eff, 'ls': ls_value, 'fc_cube': fc_cube,
                                     'sc': sc, 'j': j_value, 'cd': cd}
                     calc_dict    = {'fc_cylinder': fc_cylinder, 'ec': ec, 'zr': zr, 'delta_psi': delta_psi}
                     subgrade_info = {'cbr': cbr_value, 'mr_psi': mr_subgrade_psi, 'mr_mpa': mr_subgrade_mpa}
-                    fig_report   = create_pavement_structure_figure(layers_data, d_cm_selected)
                     buffer = create_word_report(pavement_type, inputs_dict, calc_dict,
                                                comparison_results, d_cm_selected, (passed_sel, ratio_sel),
-                                               layers_data, project_name, fig_report, subgrade_info, e_eq_psi)
-                    if fig_report:
-                        plt.close(fig_report)
+                                               layers_data, project_name, None, subgrade_info, e_eq_psi,
+                                               structure_png=build_structure_png(
+                                                   layers_key, d_cm_selected, WORD_FIGURE_DPI),
+                                               timestamp=export_ts)
                     if buffer:
                         st.download_button(
                             "⬇️ ดาวน์โหลดรายงาน (.docx)", buffer,
-                            f"AASHTO_Design_{datetime.now().strftime('%Y%m%d_%H%M')}.docx",
+                            f"AASHTO_Design_{export_ts:%Y%m%d_%H%M}.docx",
                             "application/vnd.openxmlformats-officedocument.wordprocessingml.document")
 
 
@@ -2433,14 +2276,16 @@ def render_tab_nomograph_ls():
             }
             if st.button("📄 สร้างรายงาน Nomograph (Word)", key="btn_nomo_report"):
                 with st.spinner("กำลังสร้างรายงาน..."):
+                    export_ts = datetime.now()
                     doc_file, err = generate_word_report_nomograph(
-                        params, st.session_state.get('img1_bytes'), st.session_state.get('img2_bytes'))
+                        params, st.session_state.get('img1_bytes'), st.session_state.get('img2_bytes'),
+                        timestamp=export_ts)
                     if err:
                         st.error(err)
                     else:
                         st.download_button(
                             "📥 ดาวน์โหลด Word Report", doc_file,
-                            f"AASHTO_Nomograph_{datetime.now().strftime('%Y%m%d')}.docx",
+                            f"AASHTO_Nomograph_{export_ts:%Y%m%d}.docx",
                             "application/vnd.openxmlformats-officedocument.wordprocessingml.document")
 
         with col_img2:
@@ -2459,6 +2304,7 @@ def render_tab_save():
 
     if st.button("💾 สร้างไฟล์บันทึก", type="primary"):
         num_layers = st.session_state.get('calc_num_layers', 5)
+        export_ts  = datetime.now()  # save_date ในไฟล์และชื่อไฟล์ใช้เวลาเดียวกัน
         project_data = collect_design_data(
             project_name     = st.session_state.get('calc_project_name', ''),
             pavement_type    = st.session_state.get('calc_pave_type', 'JPCP'),
@@ -2490,11 +2336,12 @@ def render_tab_save():
                                 for k in ['gx1','gy1','gx2','gy2','s1_sx','s1_sy_esb','s1_sy_mr']},
             img2_sliders     = {k: st.session_state.get(k)
                                 for k in ['_ls_x1','_ls_y1','_ls_x2','_ls_y2','k_pos_x','axis_left','axis_bottom']},
+            timestamp        = export_ts,
         )
         json_bytes = save_project_to_json(project_data)
         proj_name  = project_data['project_info']['project_name'] or 'Project'
         st.download_button("📥 ดาวน์โหลดไฟล์ JSON", json_bytes,
-                           f"{proj_name}_rigid_cal_{datetime.now().strftime('%Y%m%d_%H%M')}.json",
+                           f"{proj_name}_rigid_cal_{export_ts:%Y%m%d_%H%M}.json",
                            "application/json")
         st.success("สร้างไฟล์บันทึกสำเร็จ!")
 
@@ -2776,6 +2623,7 @@ def render_tab_report():
             passed_crcp, ratio_crcp = check_design(w18_r, w18_crcp)
             subgrade_crcp = {'cbr': crcp_cbr_use, 'mr_psi': crcp_mr_use, 'mr_mpa': crcp_mr_use / 145.038}
 
+            export_ts = datetime.now()
             try:
                 buf, err = create_full_word_report(
                     section_prefix    = st.session_state.get('rpt_prefix', '4.5'),
@@ -2808,11 +2656,12 @@ def render_tab_report():
                     img1_bytes_crcp   = st.session_state.get('img1_bytes'),
                     img2_bytes_crcp   = st.session_state.get('img2_bytes'),
                     include_summary_section = st.session_state.get('rpt_include_summary', True),
+                    timestamp         = export_ts,
                 )
                 if err:
                     st.error(f"❌ ข้อผิดพลาด: {err}")
                 elif buf:
-                    filename = f"Concrete_Report_{proj_name_r or 'Project'}_{datetime.now().strftime('%Y%m%d_%H%M')}.docx"
+                    filename = f"Concrete_Report_{proj_name_r or 'Project'}_{export_ts:%Y%m%d_%H%M}.docx"
                     st.success("✅ สร้างรายงานสำเร็จ!")
                     st.download_button(
                         "⬇️ ดาวน์โหลดรายงาน Word (ฉบับสมบูรณ์)", buf, filename,
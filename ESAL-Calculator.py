@@ -766,53 +766,72 @@ def get_all_truck_factors_table(pavement_type, pt):
 # ============================================================
 # Preview HTML for intro paragraph
 # ============================================================
-def generate_intro_preview_html(pavement_type, num_years, tbl_param, tbl_tf, tbl_esal, section_num):
+# สี highlight กำหนดเป็น class .hi-p / .hi-y ใน <style> ของ main()
+_WRAPPER_OPEN = ('<div style="background: #f9f9f9; padding: 15px; border-radius: 8px; border: 1px solid #ddd; '
+                 'font-family: \'TH SarabunPSK\', sans-serif; font-size: 15px; line-height: 1.8;">')
+_WRAPPER_CLOSE = '</div>'
+_HI_Y = '<span class="hi-y">{}</span>'.format
+_HI_P = '<span class="hi-p">{}</span>'.format
+_NBSP2 = '&nbsp;&nbsp;'
+_BR2 = '<br><br>'
+_P_OPEN = '<p style="text-indent: 40px; text-align: justify; text-justify: inter-character; margin: 0;">'
+_P_CLOSE = '</p>'
+
+# pavement_type -> (ชื่อผิวทางภาษาไทย, ชื่อภาษาอังกฤษ, ประโยคนำ)
+_INTRO_LABELS = {
+    'flexible': ('ยืดหยุ่น', 'Flexible Pavement',
+                 'ในการคำนวณปริมาณเพลามาตรฐาน สำหรับผิวทางยืดหยุ่น ที่ปรึกษาได้'),
+    'rigid': ('แบบแข็ง', 'Rigid Pavement',
+              'ในการคำนวณปริมาณเพลามาตรฐานสำหรับผิวทางแบบแข็งหรือผิวทางคอนกรีต โดยที่ปรึกษาได้'),
+}
+
+
+def _build_intro_format(pavement_thai: str, pavement_eng: str, lead: str) -> str:
+    """ประกอบ format string ของบทเกริ่นนำ (ส่วนที่ผู้ใช้กรอกเป็น {key})"""
+    years_html = _HI_P('{num_years}')
+    return ''.join([
+        _WRAPPER_OPEN,
+        _HI_Y('{section_num}'), _NBSP2,
+        '<b>ปริมาณเพลามาตรฐาน (ESALs) ระยะเวลาออกแบบ ',
+        years_html, ' ปี ผิวทาง ', pavement_eng, '</b>',
+        _BR2, _P_OPEN,
+        lead, 'กำหนดค่าพารามิเตอร์ต่าง ๆ และค่า Truck Factor ',
+        'ของรถบรรทุกหนัก ที่ใช้สำหรับการคำนวณ ดังแสดงในตารางที่ ',
+        _HI_Y('{tbl_param}'), ' และ ',
+        _HI_Y('{tbl_tf}'), ' ',
+        'ดังนั้นค่าปริมาณเพลามาตรฐาน สำหรับผิวทาง', pavement_thai, ' ',
+        'ที่ระยะเวลาออกแบบ ', years_html, ' ปี ',
+        'แสดงดังตารางที่ ', _HI_Y('{tbl_esal}'), _P_CLOSE,
+        _WRAPPER_CLOSE,
+    ])
+
+
+# สร้าง template ของแต่ละชนิดผิวทางครั้งเดียวตอน import
+_INTRO_FORMATS = {ptype: _build_intro_format(*labels) for ptype, labels in _INTRO_LABELS.items()}
+_INTRO_FORMAT_DEFAULT = _INTRO_FORMATS['rigid']   # ชนิดอื่นที่ไม่ใช่ flexible ใช้ข้อความแบบ rigid
+
+
+def generate_intro_preview_html(pavement_type: str, num_years: int, tbl_param: str, tbl_tf: str,
+                                tbl_esal: str, section_num: str) -> str:
     """สร้าง HTML preview ของบทเกริ่นนำ พร้อม highlight สี"""
     
-    PURPLE = "background-color: #D8B4FE; padding: 1px 4px; border-radius: 3px; font-weight: bold;"
-    YELLOW = "background-color: #FDE68A; padding: 1px 4px; border-radius: 3px; font-weight: bold;"
-    
-    if pavement_type == 'flexible':
-        pavement_thai = "ยืดหยุ่น"
-        intro_html = (
-            f'<span style="{YELLOW}">{section_num}</span>&nbsp;&nbsp;'
-            f'<b>ปริมาณเพลามาตรฐาน (ESALs) ระยะเวลาออกแบบ '
-            f'<span style="{PURPLE}">{num_years}</span> ปี ผิวทาง Flexible Pavement</b>'
-            f'<br><br>'
-            f'<p style="text-indent: 40px; text-align: justify; text-justify: inter-character; margin: 0;">'
-            f'ในการคำนวณปริมาณเพลามาตรฐาน สำหรับผิวทาง{pavement_thai} '
-            f'ที่ปรึกษาได้กำหนดค่าพารามิเตอร์ต่าง ๆ และค่า Truck Factor '
-            f'ของรถบรรทุกหนัก ที่ใช้สำหรับการคำนวณ ดังแสดงในตารางที่ '
-            f'<span style="{YELLOW}">{tbl_param}</span> และ '
-            f'<span style="{YELLOW}">{tbl_tf}</span> '
-            f'ดังนั้นค่าปริมาณเพลามาตรฐาน สำหรับผิวทาง{pavement_thai} '
-            f'ที่ระยะเวลาออกแบบ <span style="{PURPLE}">{num_years}</span> ปี '
-            f'แสดงดังตารางที่ <span style="{YELLOW}">{tbl_esal}</span></p>'
-        )
-    else:
-        pavement_thai = "แบบแข็ง"
-        intro_html = (
-            f'<span style="{YELLOW}">{section_num}</span>&nbsp;&nbsp;'
-            f'<b>ปริมาณเพลามาตรฐาน (ESALs) ระยะเวลาออกแบบ '
-            f'<span style="{PURPLE}">{num_years}</span> ปี ผิวทาง Rigid Pavement</b>'
-            f'<br><br>'
-            f'<p style="text-indent: 40px; text-align: justify; text-justify: inter-character; margin: 0;">'
-            f'ในการคำนวณปริมาณเพลามาตรฐานสำหรับผิวทางแบบแข็งหรือผิวทางคอนกรีต '
-            f'โดยที่ปรึกษาได้กำหนดค่าพารามิเตอร์ต่าง ๆ และค่า Truck Factor '
-            f'ของรถบรรทุกหนัก ที่ใช้สำหรับการคำนวณ ดังแสดงในตารางที่ '
-            f'<span style="{YELLOW}">{tbl_param}</span> และ '
-            f'<span style="{YELLOW}">{tbl_tf}</span> '
-            f'ดังนั้นค่าปริมาณเพลามาตรฐาน สำหรับผิวทาง{pavement_thai} '
-            f'ที่ระยะเวลาออกแบบ <span style="{PURPLE}">{num_years}</span> ปี '
-            f'แสดงดังตารางที่ <span style="{YELLOW}">{tbl_esal}</span></p>'
-        )
-    
-    return f'''
-    <div style="background: #f9f9f9; padding: 15px; border-radius: 8px; border: 1px solid #ddd;
-                font-family: 'TH SarabunPSK', sans-serif; font-size: 15px; line-height: 1.8;">
-        {intro_html}
-    </div>
-    '''
+    return _INTRO_FORMATS.get(pavement_type, _INTRO_FORMAT_DEFAULT).format_map({
+        'section_num': section_num,
+        'num_years': num_years,
+        'tbl_param': tbl_param,
+        'tbl_tf': tbl_tf,
+        'tbl_esal': tbl_esal,
+    })
+
+
+@st.cache_data(show_spinner=False)
+def generate_intro_previews(configs):
+    """สร้าง HTML preview หลายหัวข้อในครั้งเดียว
+
+    configs: tuple ของ (pavement_type, num_years, tbl_param, tbl_tf, tbl_esal, section_num)
+    คืนค่า list ของ HTML เรียงตามลำดับ configs (ค้น cache ครั้งเดียวต่อหน้า)
+    """
+    return [generate_intro_preview_html(*cfg) for cfg in configs]
 
 
 # ============================================================
@@ -832,6 +851,8 @@ def main():
     .metric-box { background: linear-gradient(135deg, #1E3A5F 0%, #4A6FA5 100%); padding: 1.5rem; border-radius: 10px; color: white; text-align: center; margin: 0.5rem 0; }
     .metric-value { font-size: 2rem; font-weight: bold; }
     .metric-label { font-size: 0.9rem; opacity: 0.9; }
+    .hi-p { background-color: #D8B4FE; padding: 1px 4px; border-radius: 3px; font-weight: bold; }
+    .hi-y { background-color: #FDE68A; padding: 1px 4px; border-radius: 3px; font-weight: bold; }
     </style>
     """, unsafe_allow_html=True)
     
@@ -1244,24 +1265,21 @@ def main():
                     rigid_tbl_tf = increment_table_number(rigid_table_start, 1)
                     rigid_tbl_esal = increment_table_number(rigid_table_start, 2)
                     
+                    html_flex, html_rigid = generate_intro_previews((
+                        ('flexible', num_years, flex_tbl_param, flex_tbl_tf, flex_tbl_esal,
+                         flex_section_number),
+                        ('rigid', num_years, rigid_tbl_param, rigid_tbl_tf, rigid_tbl_esal,
+                         rigid_section_number),
+                    ))
+                    
                     col_prev1, col_prev2 = st.columns(2)
                     
                     with col_prev1:
                         st.markdown("**🛤️ Flexible Pavement**")
-                        html_flex = generate_intro_preview_html(
-                            'flexible', num_years,
-                            flex_tbl_param, flex_tbl_tf, flex_tbl_esal,
-                            flex_section_number
-                        )
                         st.markdown(html_flex, unsafe_allow_html=True)
                     
                     with col_prev2:
                         st.markdown("**🧱 Rigid Pavement**")
-                        html_rigid = generate_intro_preview_html(
-                            'rigid', num_years,
-                            rigid_tbl_param, rigid_tbl_tf, rigid_tbl_esal,
-                            rigid_section_number
-                        )
                         st.markdown(html_rigid, unsafe_allow_html=True)
                     
                     st.caption("🟣 สีม่วง = ดึงจากข้อมูลอัตโนมัติ | 🟡 สีเหลือง = ผู้ใช้กรอกเอง")
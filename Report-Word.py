@@ -18,16 +18,21 @@ Pavement Design Report Merger – 10 Files
 """
 
 import streamlit as st
-import os
-import tempfile
+import gc
 from datetime import datetime
 from docx import Document
 from docx.shared import Pt, Cm
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 from docx.enum.section import WD_ORIENT
-from docx.oxml.ns import qn
+from docx.enum.style import WD_STYLE_TYPE
+from docx.oxml import OxmlElement, parse_xml
+from docx.oxml.ns import nsdecls, qn
+from docx.opc.constants import RELATIONSHIP_TYPE as RT
 from docxcompose.composer import Composer
+from concurrent.futures import ThreadPoolExecutor
 import io
+import zipfile
+from lxml import etree
 
 # ═══════════════════════════════════════════════════════════════
 # CONFIG: โครงสร้างรายงาน (10 ไฟล์อัปโหลด + หัวข้อใหญ่ 2, 5)
@@ -156,6 +161,10 @@ SECTION_CONFIG = [
     },
 ]
 
+# รายการหัวข้อทั้งหมดเรียงตามลำดับรายงาน (flatten ครั้งเดียวตอน import)
+ALL_ITEMS = tuple(item for group in SECTION_CONFIG for item in group["items"])
+ALL_KEYS = tuple(item["key"] for item in ALL_ITEMS)
+
 # ═══════════════════════════════════════════════════════════════
 # PAGE CONFIG + CSS (สไตล์เดียวกับ v3.0)
 # ═══════════════════════════════════════════════════════════════
@@ -166,7 +175,12 @@ st.set_page_config(
     layout="wide"
 )
 
-st.markdown("""
+PAGE_HEADER_HTML = (
+    '<div class="main-header">🛣️ Pavement Design Report Merger – 10 Files</div>'
+    '<div class="sub-header">โปรแกรมรวมรายงานออกแบบโครงสร้างชั้นทาง ตามโครงสร้างมาตรฐานที่กำหนด</div>'
+)
+
+PAGE_CSS = """
 <style>
     .main-header {
         font-size: 28px;
@@ -232,22 +246,91 @@ st.markdown("""
         background: linear-gradient(135deg, #764ba2 0%, #667eea 100%);
     }
 </style>
-""", unsafe_allow_html=True)
+"""
+
+st.markdown(PAGE_CSS, unsafe_allow_html=True)
 
 # ═══════════════════════════════════════════════════════════════
 # Utility
 # ═══════════════════════════════════════════════════════════════
 
-def set_thai_font(run, font_name="TH Sarabun New", font_size=15):
-    run.font.name = font_name
-    run.font.size = Pt(font_size)
-    r = run._r
-    rPr = r.get_or_add_rPr()
-    rFonts = rPr.get_or_add_rFonts()
-    rFonts.set(qn('w:ascii'), font_name)
-    rFonts.set(qn('w:hAnsi'), font_name)
-    rFonts.set(qn('w:cs'), font_name)
-    rFonts.set(qn('w:eastAsia'), font_name)
+THAI_FONT = "TH Sarabun New"
+
+# ชื่อ tag/attribute ที่ใช้ใน loop แปลงด้วย qn ครั้งเดียวตอน import
+QN_CS = qn('w:cs')
+QN_EAST_ASIA = qn('w:eastAsia')
+QN_SECT_PR = qn('w:sectPr')
+# attribute ที่อ้าง relationship ของ part (รูปภาพ, ลิงก์, chart, OLE ...)
+QN_REL_ATTRS = (qn('r:embed'), qn('r:id'), qn('r:link'))
+QN_BODY = qn('w:body')
+QN_P = qn('w:p')
+QN_TBL = qn('w:tbl')
+
+# paragraph style ของปก/สารบัญ/หัวข้อ: ชื่อ style -> (ขนาด pt, ตัวหนา, การจัดวาง)
+THAI_STYLES = {
+    "ThaiTitle": (24, True, WD_ALIGN_PARAGRAPH.CENTER),
+    "ThaiSubtitle": (20, True, WD_ALIGN_PARAGRAPH.CENTER),
+    "ThaiDate": (16, False, WD_ALIGN_PARAGRAPH.CENTER),
+    "ThaiTocTitle": (18, True, WD_ALIGN_PARAGRAPH.CENTER),
+    "ThaiHeading": (18, True, WD_ALIGN_PARAGRAPH.LEFT),
+    "ThaiBody": (15, False, None),
+}
+
+# element ใน settings.xml ที่ต้องอยู่หลัง w:updateFields ตาม schema
+SETTINGS_AFTER_UPDATE_FIELDS = (
+    "w:hdrShapeDefaults", "w:footnotePr", "w:endnotePr", "w:compat", "w:docVars",
+    "w:rsids", "m:mathPr", "w:attachedSchema", "w:themeFontLang", "w:clrSchemeMapping",
+    "w:doNotIncludeSubdocsInStats", "w:doNotAutoCompressPictures", "w:forceUpgrade",
+    "w:captions", "w:readModeInkLockDown", "w:smartTagType", "sl:schemaLibrary",
+    "w:shapeDefaults", "w:doNotEmbedSmartTags", "w:decimalSymbol", "w:listSeparator",
+)
+
+
+def add_thai_styles(doc):
+    # ตั้ง font ไทยครั้งเดียวที่ระดับ style แทนการตั้ง rFonts ทีละ run
+    for name, (font_size, bold, alignment) in THAI_STYLES.items():
+        if name in doc.styles:
+            continue
+        style = doc.styles.add_style(name, WD_STYLE_TYPE.PARAGRAPH)
+        style.base_style = doc.styles['Normal']
+        style.font.name = THAI_FONT
+        style.font.size = Pt(font_size)
+        style.font.bold = bold
+        if alignment is not None:
+            style.paragraph_format.alignment = alignment
+        rFonts = style.element.get_or_add_rPr().get_or_add_rFonts()
+        rFonts.set(QN_CS, THAI_FONT)
+        rFonts.set(QN_EAST_ASIA, THAI_FONT)
+
+        if name == "ThaiHeading":
+            # ให้หัวข้อบทเป็น outline level 1 เพื่อให้ field TOC (\u) ดึงไปแสดง
+            outline_lvl = OxmlElement('w:outlineLvl')
+            outline_lvl.set(qn('w:val'), '0')
+            style.element.get_or_add_pPr().append(outline_lvl)
+
+
+# field สารบัญทั้งชุดเป็น XML ก้อนเดียว parse ครั้งเดียวตอนใช้ ไม่ต้องสร้าง element ทีละตัว
+TOC_FIELD_RUN_XML = (
+    f'<w:r {nsdecls("w")}>'
+    '<w:fldChar w:fldCharType="begin"/>'
+    '<w:instrText xml:space="preserve">TOC \\o "1-3" \\h \\z \\u</w:instrText>'
+    '<w:fldChar w:fldCharType="separate"/>'
+    '<w:t>คลิกขวาแล้วเลือก Update Field เพื่อแสดงสารบัญ</w:t>'
+    '<w:fldChar w:fldCharType="end"/>'
+    '</w:r>'
+)
+
+
+def add_toc_field(doc):
+    # สารบัญเป็น field ของ Word สร้าง/อัปเดตตอนเปิดไฟล์ (คลิกขวา > Update Field)
+    doc.add_paragraph(style="ThaiBody")._p.append(parse_xml(TOC_FIELD_RUN_XML))
+
+    if doc.settings.element.find(qn('w:updateFields')) is not None:
+        return
+    update_fields = OxmlElement('w:updateFields')
+    update_fields.set(qn('w:val'), 'true')
+    # settings.xml ต้องเรียง element ตาม schema จึงแทรกก่อน element ที่ตามหลัง updateFields
+    doc.settings.element.insert_element_before(update_fields, *SETTINGS_AFTER_UPDATE_FIELDS)
 
 
 def set_page_margins(section):
@@ -262,133 +345,217 @@ def set_page_margins(section):
     section.footer_distance = Cm(1.25)
 
 
-def validate_docx_file(file):
+def upload_bytes(file):
+    # เก็บ bytes ของแต่ละ upload ไว้ชุดเดียวใน session_state (key ตาม file_id) ใช้ร่วมกันทั้งตอนตรวจและตอนรวม
+    cache_key = f"_bytes_{file.file_id}"
+    if cache_key not in st.session_state:
+        st.session_state[cache_key] = file.getvalue()
+    return st.session_state[cache_key]
+
+
+def prune_upload_bytes(uploaded_files):
+    # ไฟล์ที่ถูกลบ/แทนที่แล้ว file_id จะเปลี่ยน ล้าง bytes เก่าออกจาก session_state
+    live = {f"_bytes_{file.file_id}" for file in uploaded_files.values() if file is not None}
+    for cache_key in [k for k in st.session_state if k.startswith("_bytes_") and k not in live]:
+        del st.session_state[cache_key]
+
+
+def has_body_content(xml_file):
+    # อ่าน document.xml แบบ stream แล้วหยุดทันทีที่เจอ w:p/w:tbl ระดับ body (ไม่ต้องสร้าง Document)
+    for _, element in etree.iterparse(xml_file, events=("start",), tag=(QN_P, QN_TBL)):
+        if element.getparent().tag == QN_BODY:
+            return True
+    return False
+
+
+def validate_docx_file(file_bytes):
+    # ตรวจแบบเบา (ZIP magic + word/document.xml + มีเนื้อหาใน body) ส่วนการ parse เต็มรูปแบบทำครั้งเดียวตอนรวมไฟล์
+    if not file_bytes.startswith(b"PK\x03\x04"):
+        return False, "ไฟล์เสียหายหรือไม่ใช่ไฟล์ .docx ที่ถูกต้อง (ไม่ใช่ไฟล์ ZIP)"
     try:
-        file_bytes = file.read()
-        file.seek(0)
-        doc = Document(io.BytesIO(file_bytes))
-        if len(doc.paragraphs) == 0 and len(doc.tables) == 0:
-            return False, "ไฟล์ว่างเปล่า ไม่มีเนื้อหา"
-        return True, ""
+        with zipfile.ZipFile(io.BytesIO(file_bytes)) as zf:
+            if "word/document.xml" not in zf.namelist():
+                return False, "ไฟล์เสียหายหรือไม่ใช่ไฟล์ .docx ที่ถูกต้อง (ไม่พบ word/document.xml)"
+            with zf.open("word/document.xml") as xml_file:
+                if not has_body_content(xml_file):
+                    return False, "ไฟล์ว่างเปล่า ไม่มีเนื้อหา"
     except Exception as e:
         return False, f"ไฟล์เสียหายหรือไม่ใช่ไฟล์ .docx ที่ถูกต้อง ({str(e)})"
+    return True, ""
+
+
+def load_source_document(file_bytes):
+    doc = Document(io.BytesIO(file_bytes))
+    body = doc.element.body
+    # รายงานย่อยทุกไฟล์ใช้ขนาดหน้า/ระยะขอบของไฟล์รวม ตัด section break ภายในทิ้งก่อนรวม
+    # Composer จะได้ไม่ต้อง merge section/header/footer ทีละไฟล์ (sectPr ท้าย body เก็บไว้ Composer ข้ามให้เอง)
+    for sectPr in body.xpath('./w:p/w:pPr/w:sectPr'):
+        pPr = sectPr.getparent()
+        pPr.remove(sectPr)
+        paragraph = pPr.getparent()
+        if len(paragraph) == 1 and len(pPr) == 0:
+            body.remove(paragraph)
+    return doc
 
 
-def get_all_items():
-    items = []
-    for group in SECTION_CONFIG:
-        for item in group["items"]:
-            items.append(item)
-    return items
-
 # ═══════════════════════════════════════════════════════════════
 # สร้างปก + สารบัญ + รวมไฟล์
 # ═══════════════════════════════════════════════════════════════
 
-def create_cover_and_toc(uploaded_files, project_name, report_date):
-    doc = Document()
-    section = doc.sections[0]
+def create_cover_and_toc(project_name, report_date, doc=None):
+    if doc is None:
+        doc = Document()
+    section = doc.sections[-1]
     set_page_margins(section)
+    add_thai_styles(doc)
 
     # ปก
     spacer = doc.add_paragraph()
     spacer.alignment = WD_ALIGN_PARAGRAPH.CENTER
     spacer.add_run("\n\n\n\n\n")
 
-    main_title = doc.add_paragraph()
-    main_title.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    run = main_title.add_run("รายงานการออกแบบโครงสร้างชั้นทาง")
-    set_thai_font(run, font_size=24)
-    run.font.bold = True
+    doc.add_paragraph("รายงานการออกแบบโครงสร้างชั้นทาง", style="ThaiTitle")
 
     if project_name:
-        p = doc.add_paragraph()
-        p.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        run = p.add_run(f"\n{project_name}")
-        set_thai_font(run, font_size=20)
-        run.font.bold = True
+        doc.add_paragraph(f"\n{project_name}", style="ThaiSubtitle")
 
-    date_p = doc.add_paragraph()
-    date_p.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    run = date_p.add_run(f"\n\n\n\n{report_date}")
-    set_thai_font(run, font_size=16)
+    doc.add_paragraph(f"\n\n\n\n{report_date}", style="ThaiDate")
 
     doc.add_page_break()
 
     # สารบัญ
-    toc_title = doc.add_paragraph()
-    toc_title.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    run = toc_title.add_run("สารบัญ")
-    set_thai_font(run, font_size=18)
-    run.font.bold = True
-
-    doc.add_paragraph()
+    doc.add_paragraph("สารบัญ", style="ThaiTocTitle")
 
-    all_items = get_all_items()
-    section_num = 1
-    for item in all_items:
-        if uploaded_files.get(item["key"]) is not None:
-            toc_para = doc.add_paragraph()
-            run = toc_para.add_run(f"{section_num}. {item['report_title']}")
-            set_thai_font(run, font_size=15)
-            section_num += 1
+    add_toc_field(doc)
 
     doc.add_page_break()
     return doc
 
 
-def create_section_header_doc(section_num, title):
-    header_doc = Document()
-    p = header_doc.add_paragraph()
-    p.alignment = WD_ALIGN_PARAGRAPH.LEFT
-    run = p.add_run(f"{section_num}. {title}")
-    set_thai_font(run, font_size=18)
-    run.font.bold = True
-    header_doc.add_paragraph()
-    return header_doc
+def add_section_heading(doc, section_num, title):
+    # เขียนหัวข้อลง master โดยตรง ไม่ต้องสร้าง Document แยกแล้ว composer.append
+    doc.add_paragraph(f"{section_num}. {title}", style="ThaiHeading")
+    doc.add_paragraph()
 
 
-def merge_documents(uploaded_files, project_name, report_date, progress_callback=None):
-    master_doc = create_cover_and_toc(uploaded_files, project_name, report_date)
-    composer = Composer(master_doc)
+def append_body(master_doc, source_doc):
+    # โหมดรวมเร็ว: ย้าย element ใน body ต้นทางเข้า master ตรงๆ ไม่ผ่าน Composer
+    # style/numbering ใช้ของ master จึงเหมาะกับไฟล์ที่มาจาก template เดียวกัน
+    # ทุก r:embed/r:id/r:link ต้องผูก relationship ใหม่: ลิงก์ภายนอก relate ใหม่ รูปภาพคัดลอกเข้า master
+    # ถ้าอ้าง part ภายในชนิดอื่น (chart, OLE, SmartArt ...) คืน False โดยยังไม่แตะ master ให้ผู้เรียกใช้ Composer แทน
+    master_body = master_doc.element.body
+    elements = [element for element in source_doc.element.body if element.tag != QN_SECT_PR]
+    rels = source_doc.part.rels
+    refs = [(node, attr, node.get(attr))
+            for element in elements for node in element.iter()
+            for attr in QN_REL_ATTRS if node.get(attr) is not None]
+    for _, _, rId in refs:
+        rel = rels.get(rId)
+        if rel is None or not (rel.is_external or rel.reltype == RT.IMAGE):
+            return False
+
+    rId_map = {}
+    for node, attr, rId in refs:
+        if rId not in rId_map:
+            rel = rels[rId]
+            if rel.is_external:
+                rId_map[rId] = master_doc.part.relate_to(rel.target_ref, rel.reltype, is_external=True)
+            else:
+                rId_map[rId], _ = master_doc.part.get_or_add_image(io.BytesIO(rel.target_part.blob))
+        node.set(attr, rId_map[rId])
+
+    # ต่อท้ายทั้งชุดด้วย extend ครั้งเดียว แล้วย้าย sectPr ของ master กลับไปไว้ท้ายสุด
+    body_sectPr = master_body.find(QN_SECT_PR)
+    master_body.extend(elements)
+    master_body.append(body_sectPr)
+    return True
+
+
+def merge_single_document(source_doc, project_name, report_date, title):
+    # ไฟล์เดียว: เขียนปก/สารบัญ/หัวข้อต่อท้ายไฟล์ต้นทาง แล้วย้ายเนื้อหาเดิมไปไว้หลังสุด ไม่ต้องผ่าน Composer
+    body = source_doc.element.body
+    content = [element for element in body if element.tag != QN_SECT_PR]
+    create_cover_and_toc(project_name, report_date, doc=source_doc)
+    add_section_heading(source_doc, 1, title)
+    body_sectPr = body.find(QN_SECT_PR)
+    for element in content:
+        if body_sectPr is None:
+            body.append(element)
+        else:
+            body_sectPr.addprevious(element)
+    return source_doc
+
 
-    all_items = get_all_items()
+def merge_documents(uploaded_files, project_name, report_date, progress_callback=None, fast_merge=False):
     active_items = [(item, uploaded_files[item["key"]])
-                    for item in all_items
+                    for item in ALL_ITEMS
                     if uploaded_files.get(item["key"]) is not None]
     total = len(active_items)
 
-    for idx, (item, file) in enumerate(active_items):
-        section_num = idx + 1
+    # parse แต่ละไฟล์แบบขนาน (lxml/zlib ปล่อย GIL ระหว่าง parse) ผลลัพธ์เรียงตามลำดับเดิม
+    # ดึง bytes จาก session_state ใน thread หลักก่อน เพราะ worker thread ไม่มี script context
+    all_bytes = [upload_bytes(file) for _, file in active_items]
+    with ThreadPoolExecutor(max_workers=max(1, min(8, total))) as executor:
+        source_docs = list(executor.map(load_source_document, all_bytes))
+
+    if total == 1:
+        item = active_items[0][0]
+        merged_doc = merge_single_document(source_docs[0], project_name, report_date, item["report_title"])
+        if progress_callback:
+            progress_callback(1.0, f"กำลังรวม: {item['report_title']}")
+        return merged_doc
+
+    master_doc = create_cover_and_toc(project_name, report_date)
+    composer = None if fast_merge else Composer(master_doc)
 
-        header_doc = create_section_header_doc(section_num, item["report_title"])
-        composer.append(header_doc)
+    for idx, ((item, _), source_doc) in enumerate(zip(active_items, source_docs)):
+        section_num = idx + 1
 
-        file_bytes = file.read()
-        file.seek(0)
-        source_doc = Document(io.BytesIO(file_bytes))
-        composer.append(source_doc)
+        add_section_heading(master_doc, section_num, item["report_title"])
+        # ไฟล์ที่มี part ภายในชนิดอื่นนอกจากรูปภาพ ใช้ Composer แม้อยู่ในโหมดรวมเร็ว
+        if not (fast_merge and append_body(master_doc, source_doc)):
+            if composer is None:
+                composer = Composer(master_doc)
+            composer.append(source_doc)
+        # ปล่อย Document ต้นทางทันทีที่รวมเสร็จ ไม่ต้องค้างไว้จนจบ loop
+        source_docs[idx] = None
 
         if progress_callback:
             progress_callback((idx + 1) / total, f"กำลังรวม: {item['report_title']}")
 
-    return composer.doc
+    # docxcompose ทิ้ง reference วนไว้ เก็บกวาดครั้งเดียวหลังรวมครบ (ไม่ทำทุกรอบเพราะ gc.collect เองก็แพง)
+    source_doc = composer = None
+    gc.collect()
+
+    return master_doc
+
+
+def file_ids(uploaded_files):
+    # file_id ของ Streamlit ไม่ซ้ำกันในแต่ละการอัปโหลด ใช้เป็น key ได้ทันทีโดยไม่ต้องอ่าน/hash เนื้อไฟล์ทุก rerun
+    return tuple((item["key"], uploaded_files[item["key"]].file_id)
+                 for item in ALL_ITEMS
+                 if uploaded_files.get(item["key"]) is not None)
+
+
+def build_report_bytes(uploaded_files, project_name, report_date, fast_merge, progress_callback=None):
+    merged_doc = merge_documents(uploaded_files, project_name, report_date,
+                                 progress_callback=progress_callback, fast_merge=fast_merge)
+    buf = io.BytesIO()
+    merged_doc.save(buf)
+    return buf.getvalue()
 
 # ═══════════════════════════════════════════════════════════════
 # UI Rendering
 # ═══════════════════════════════════════════════════════════════
 
 def render_single_uploader(item):
-    st.markdown('<div class="file-section">', unsafe_allow_html=True)
-    st.markdown(item["label"])
-    uploaded = st.file_uploader(
+    st.markdown(f'<div class="file-section">\n\n{item["label"]}\n\n</div>', unsafe_allow_html=True)
+    return st.file_uploader(
         item["uploader_label"],
         type=['docx'],
         key=item["key"],
         help=item["help"],
     )
-    st.markdown('</div>', unsafe_allow_html=True)
-    return uploaded
 
 
 def render_upload_sections():
@@ -419,18 +586,18 @@ def render_upload_sections():
 def render_file_status(uploaded_files):
     st.markdown("### 📊 สถานะไฟล์ที่อัปโหลด")
 
-    all_items = get_all_items()
-    file_count = sum(1 for item in all_items if uploaded_files.get(item["key"]) is not None)
+    present = {key for key in ALL_KEYS if uploaded_files.get(key) is not None}
+    file_count = len(present)
 
     cols = st.columns(3)
-    for i, item in enumerate(all_items):
+    for i, item in enumerate(ALL_ITEMS):
         with cols[i % 3]:
-            if uploaded_files.get(item["key"]) is not None:
+            if item["key"] in present:
                 st.success(f"{item['title']}: ✅ อัปโหลดแล้ว")
             else:
                 st.warning(f"{item['title']}: ⬜ ยังไม่อัปโหลด")
 
-    st.markdown(f"### 📈 อัปโหลดแล้ว: **{file_count}** จาก **{len(all_items)}** ไฟล์")
+    st.markdown(f"### 📈 อัปโหลดแล้ว: **{file_count}** จาก **{len(ALL_KEYS)}** ไฟล์")
     return file_count
 
 # ═══════════════════════════════════════════════════════════════
@@ -438,8 +605,7 @@ def render_file_status(uploaded_files):
 # ═══════════════════════════════════════════════════════════════
 
 def main():
-    st.markdown('<div class="main-header">🛣️ Pavement Design Report Merger – 10 Files</div>', unsafe_allow_html=True)
-    st.markdown('<div class="sub-header">โปรแกรมรวมรายงานออกแบบโครงสร้างชั้นทาง ตามโครงสร้างมาตรฐานที่กำหนด</div>', unsafe_allow_html=True)
+    st.markdown(PAGE_HEADER_HTML, unsafe_allow_html=True)
 
     st.markdown("### 📋 ข้อมูลโครงการ")
     col1, col2 = st.columns(2)
@@ -455,6 +621,7 @@ def main():
     st.info("ระบบจะสร้างปก + สารบัญ และรวมเฉพาะไฟล์ที่อัปโหลด เรียงตามลำดับมาตรฐาน")
 
     uploaded_files = render_upload_sections()
+    prune_upload_bytes(uploaded_files)
 
     st.markdown("---")
 
@@ -464,68 +631,83 @@ def main():
 
     col1, col2, col3 = st.columns([1, 2, 1])
     with col2:
+        fast_merge = st.checkbox(
+            "โหมดรวมเร็ว (same-template)",
+            help="รวมเนื้อหาโดยตรงโดยไม่ผ่าน docxcompose เร็วกว่ามาก เหมาะกับไฟล์ที่สร้างจากโปรแกรมชุดเดียวกัน "
+                 "(style/รายการลำดับเลขจะใช้ของไฟล์รวม)",
+        )
         merge_button = st.button("🔄 รวมไฟล์และสร้างรายงาน", use_container_width=True)
 
+    # ผลรวมไฟล์เก็บใน session_state ตาม file_id ของไฟล์ + ชื่อโครงการ/วันที่/โหมดรวม
+    # rerun จากการกดดาวน์โหลดหรือ widget อื่นจึงไม่ต้องรวมใหม่ และปุ่มดาวน์โหลดยังแสดงอยู่
+    merge_key = (file_ids(uploaded_files), project_name, report_date_str, fast_merge)
+
     if merge_button:
         if file_count == 0:
             st.error("❌ กรุณาอัปโหลดไฟล์อย่างน้อย 1 ไฟล์")
         else:
+            active = [(item, uploaded_files[item["key"]]) for item in ALL_ITEMS
+                      if uploaded_files.get(item["key"]) is not None]
+
+            # ไฟล์เดิม (file_id เดิม) ที่เคยตรวจแล้ว ใช้ผลเดิมได้เลย ที่เหลือตรวจแบบขนาน
+            to_check = [(item, file) for item, file in active
+                        if st.session_state.get(f"_valid_{item['key']}", (None,))[0] != file.file_id]
+            if to_check:
+                with ThreadPoolExecutor(max_workers=min(8, len(to_check))) as executor:
+                    results = executor.map(validate_docx_file, [upload_bytes(file) for _, file in to_check])
+                    for (item, file), (is_valid, error_msg) in zip(to_check, results):
+                        st.session_state[f"_valid_{item['key']}"] = (file.file_id, is_valid, error_msg)
+
             validation_errors = []
-            all_items = get_all_items()
-            for item in all_items:
-                file = uploaded_files.get(item["key"])
-                if file is not None:
-                    is_valid, error_msg = validate_docx_file(file)
-                    if not is_valid:
-                        validation_errors.append(f"❌ **{item['title']}**: {error_msg}")
+            for item, _ in active:
+                _, is_valid, error_msg = st.session_state[f"_valid_{item['key']}"]
+                if not is_valid:
+                    validation_errors.append(f"❌ **{item['title']}**: {error_msg}")
 
             if validation_errors:
                 st.error("พบไฟล์ที่มีปัญหา กรุณาตรวจสอบและอัปโหลดใหม่:")
                 for err in validation_errors:
                     st.markdown(err)
-            else:
+            elif st.session_state.get("merged_key") != merge_key:
                 progress_bar = st.progress(0, text="เริ่มต้นรวมไฟล์...")
 
                 def update_progress(fraction, text):
                     progress_bar.progress(fraction, text=text)
 
                 try:
-                    merged_doc = merge_documents(
+                    st.session_state["merged_bytes"] = build_report_bytes(
                         uploaded_files,
                         project_name,
                         report_date_str,
+                        fast_merge,
                         progress_callback=update_progress
                     )
+                    st.session_state["merged_key"] = merge_key
 
                     progress_bar.progress(1.0, text="✅ รวมไฟล์เรียบร้อยแล้ว!")
 
-                    with tempfile.TemporaryDirectory() as temp_dir:
-                        base_filename = "รายงานออกแบบโครงสร้างชั้นทาง_10ไฟล์"
-                        if project_name:
-                            base_filename = f"รายงานออกแบบ_{project_name.replace(' ', '_')}_10ไฟล์"
-
-                        docx_path = os.path.join(temp_dir, f"{base_filename}.docx")
-                        merged_doc.save(docx_path)
+                except Exception as e:
+                    st.error(f"❌ เกิดข้อผิดพลาด: {str(e)}")
+                    st.exception(e)
 
-                        st.markdown('<div class="success-box">', unsafe_allow_html=True)
-                        st.success(f"✅ รวมไฟล์เรียบร้อยแล้ว! ({file_count} ไฟล์)")
-                        st.markdown('</div>', unsafe_allow_html=True)
+    if st.session_state.get("merged_key") == merge_key:
+        base_filename = "รายงานออกแบบโครงสร้างชั้นทาง_10ไฟล์"
+        if project_name:
+            base_filename = f"รายงานออกแบบ_{project_name.replace(' ', '_')}_10ไฟล์"
 
-                        st.markdown("### 📥 ดาวน์โหลดรายงาน")
+        st.markdown('<div class="success-box">', unsafe_allow_html=True)
+        st.success(f"✅ รวมไฟล์เรียบร้อยแล้ว! ({file_count} ไฟล์)")
+        st.markdown('</div>', unsafe_allow_html=True)
 
-                        with open(docx_path, 'rb') as f:
-                            docx_data = f.read()
-                        st.download_button(
-                            label="📄 ดาวน์โหลดไฟล์ Word (.docx)",
-                            data=docx_data,
-                            file_name=f"{base_filename}.docx",
-                            mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-                            use_container_width=True
-                        )
+        st.markdown("### 📥 ดาวน์โหลดรายงาน")
 
-                except Exception as e:
-                    st.error(f"❌ เกิดข้อผิดพลาด: {str(e)}")
-                    st.exception(e)
+        st.download_button(
+            label="📄 ดาวน์โหลดไฟล์ Word (.docx)",
+            data=st.session_state["merged_bytes"],
+            file_name=f"{base_filename}.docx",
+            mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+            use_container_width=True
+        )
 
     st.markdown("---")
     st.markdown("""
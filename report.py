@@ -2,16 +2,32 @@ import streamlit as st
 import re
 import io
 import os
-import copy
 import zipfile
 from docx import Document
 from docx.shared import Inches, Pt, Cm, Emu
 from docx.enum.text import WD_ALIGN_PARAGRAPH
-from docx.enum.table import WD_TABLE_ALIGNMENT
 from docx.oxml.ns import qn
+from docx.opc.constants import RELATIONSHIP_TYPE as RT
+from docxcompose.composer import Composer
 from PIL import Image
 import tempfile
 import shutil
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+# ─── Namespaced tags used inside element loops (resolved once) ───
+W_DRAWING = qn('w:drawing')
+W_SECT_PR = qn('w:sectPr')
+A_BLIP = qn('a:blip')
+R_EMBED = qn('r:embed')
+R_ID = qn('r:id')
+R_LINK = qn('r:link')
+REL_ATTRS = (R_EMBED, R_ID, R_LINK)
+
+# ─── Numbering patterns (compiled once, used on every rerun and per paragraph) ───
+HEADING_NUM_RE = re.compile(r'^(\d+(?:\.\d+)*)\s*(.*)')
+FIGURE_NUM_RE = re.compile(r'^(รูปที่\s*)\d+[-\.]\d+(.*)')
+TABLE_NUM_RE = re.compile(r'^(ตารางที่\s*)\d+[-\.]\d+(.*)')
 
 # ─── Page Config ───
 st.set_page_config(
@@ -44,6 +60,18 @@ st.markdown("""
 st.markdown('<div class="main-title">📄 ระบบรวมรายงาน Word</div>', unsafe_allow_html=True)
 st.markdown('<div class="sub-title">รวมไฟล์ Word แยกหัวข้อ พร้อม Upload รูปภาพ และแก้ไขหมายเลขบท/หัวข้อ</div>', unsafe_allow_html=True)
 
+class SpoolDir:
+    """Per-session temp directory for spooled uploads.
+
+    Held in st.session_state: when the session ends and the object is garbage
+    collected (or the process exits) the directory and its files are removed.
+    """
+
+    def __init__(self):
+        self.path = tempfile.mkdtemp(prefix="report_uploads_")
+        weakref.finalize(self, shutil.rmtree, self.path, ignore_errors=True)
+
+
 # ─── Initialize Session State ───
 if "sections" not in st.session_state:
     st.session_state.sections = []
@@ -53,11 +81,41 @@ if "chapter_num" not in st.session_state:
     st.session_state.chapter_num = 4
 if "start_section_num" not in st.session_state:
     st.session_state.start_section_num = 1
+if "spool_dir" not in st.session_state:
+    st.session_state.spool_dir = SpoolDir()
+
+
+def remove_spooled_file(path):
+    """Delete a spooled upload, ignoring files that are already gone."""
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+def spool_upload(uploaded_file, path=None):
+    """Write an uploaded file to a temp .docx on disk and return its path.
+
+    Sections keep only this path in session state instead of the file bytes.
+    New files go into the session's SpoolDir, so they are cleaned up with it.
+    """
+    uploaded_file.seek(0)
+    if path is None:
+        tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".docx",
+                                          dir=st.session_state.spool_dir.path)
+    else:
+        tmp = open(path, "wb")
+    with tmp:
+        shutil.copyfileobj(uploaded_file, tmp, length=1 << 20)
+    uploaded_file.seek(0)
+    return tmp.name
 
 
 def extract_docx_content(uploaded_file):
     """Extract content info from a docx file."""
-    doc = Document(io.BytesIO(uploaded_file.read()))
+    # UploadedFile is already a seekable file object; no need to copy it into a BytesIO
+    uploaded_file.seek(0)
+    doc = Document(uploaded_file)
     uploaded_file.seek(0)
     
     headings = []
@@ -74,7 +132,7 @@ def extract_docx_content(uploaded_file):
             })
         # Count images
         for run in para.runs:
-            if run._element.findall(qn('w:drawing')):
+            if run._element.findall(W_DRAWING):
                 image_count += 1
     
     return {
@@ -95,7 +153,7 @@ def renumber_headings_in_doc(doc, chapter_num, section_start, section_mapping):
             original_text = para.text.strip()
             # Match patterns like "4.1", "4.1.1", "4.2.3", or just numbers at start
             # Pattern: digits.digits or digits.digits.digits etc.
-            match = re.match(r'^(\d+(?:\.\d+)*)\s*(.*)', original_text)
+            match = HEADING_NUM_RE.match(original_text)
             if match:
                 old_num = match.group(1)
                 rest_text = match.group(2)
@@ -136,7 +194,7 @@ def renumber_figures_tables(doc, chapter_num):
         text = para.text.strip()
         
         # Match "รูปที่ X-Y" or "รูปที่ X.Y"
-        fig_match = re.match(r'^(รูปที่\s*)\d+[-\.]\d+(.*)', text)
+        fig_match = FIGURE_NUM_RE.match(text)
         if fig_match:
             fig_counter += 1
             new_text = f"{fig_match.group(1)}{chapter_num}-{fig_counter}{fig_match.group(2)}"
@@ -148,7 +206,7 @@ def renumber_figures_tables(doc, chapter_num):
                 para.add_run(new_text)
         
         # Match "ตารางที่ X-Y" or "ตารางที่ X.Y"
-        tbl_match = re.match(r'^(ตารางที่\s*)\d+[-\.]\d+(.*)', text)
+        tbl_match = TABLE_NUM_RE.match(text)
         if tbl_match:
             tbl_counter += 1
             new_text = f"{tbl_match.group(1)}{chapter_num}-{tbl_counter}{tbl_match.group(2)}"
@@ -195,14 +253,77 @@ def insert_image_after_paragraph(doc, para_index, image_bytes, caption_text, wid
     return img_para, cap_para
 
 
-def merge_documents(sections_data, chapter_num, images_dict, renumber_options):
-    """Merge multiple Word documents into one."""
+def strip_section_breaks(doc):
+    """Remove in-body section breaks so appended sections use the base page layout."""
+    body = doc.element.body
+    for sectPr in body.xpath('./w:p/w:pPr/w:sectPr'):
+        pPr = sectPr.getparent()
+        pPr.remove(sectPr)
+        para = pPr.getparent()
+        # Drop paragraphs that only existed to carry the section break
+        if len(para) == 1 and len(pPr) == 0:
+            body.remove(para)
+
+
+def append_document_body(merged_doc, section_doc):
+    """Move the body elements of section_doc to the end of merged_doc.
+
+    Paragraphs and tables keep their original order and formatting. Every
+    relationship reference (r:embed, r:id, r:link) is re-linked to the merged
+    document's package: images are copied in, external targets such as
+    hyperlinks are related again. Returns False without touching merged_doc
+    when the section references other internal parts (charts, embedded
+    objects, ...) that only Composer can carry over; otherwise section_doc is
+    consumed and True is returned.
+    """
+    merged_body = merged_doc.element.body
+    children = [child for child in section_doc.element.body if child.tag != W_SECT_PR]
+    rels = section_doc.part.rels
+    
+    # Collect every referencing attribute first so nothing is added on fallback
+    refs = [(el, attr, el.get(attr))
+            for child in children for el in child.iter()
+            for attr in REL_ATTRS if el.get(attr) is not None]
+    for _, _, rId in refs:
+        rel = rels.get(rId)
+        if rel is None or not (rel.is_external or rel.reltype == RT.IMAGE):
+            return False
+    
+    # rIds in section_doc point to its own package parts
+    rId_map = {}
+    for el, attr, rId in refs:
+        if rId not in rId_map:
+            rel = rels[rId]
+            if rel.is_external:
+                rId_map[rId] = merged_doc.part.relate_to(rel.target_ref, rel.reltype, is_external=True)
+            else:
+                rId_map[rId], _ = merged_doc.part.get_or_add_image(io.BytesIO(rel.target_part.blob))
+        el.set(attr, rId_map[rId])
+    
+    # Splice all children in one extend; the body sectPr must stay last
+    body_sectPr = merged_body.find(W_SECT_PR)
+    merged_body.extend(children)
+    if body_sectPr is not None:
+        merged_body.append(body_sectPr)
+    return True
+
+
+def merge_documents(sections_data, chapter_num, images_dict, renumber_options, fast_merge=False):
+    """Merge multiple Word documents into one.
+
+    Sections are appended with docxcompose, which carries over styles,
+    numbering and images. With fast_merge the body XML is copied directly
+    (styles/numbering of the first file are used for all sections).
+    """
     if not sections_data:
         return None
     
-    # Load first document as base
-    first_data = sections_data[0]
-    merged_doc = Document(io.BytesIO(first_data["file_bytes"]))
+    # Parse all sections in parallel (lxml/zlib release the GIL); map keeps upload order
+    with ThreadPoolExecutor(max_workers=min(8, len(sections_data))) as executor:
+        section_docs = list(executor.map(Document, [s["file_path"] for s in sections_data]))
+    
+    # First document is the base
+    merged_doc = section_docs[0]
     
     # Process renumbering on first doc if needed
     if renumber_options.get("renumber_headings", False):
@@ -212,14 +333,13 @@ def merge_documents(sections_data, chapter_num, images_dict, renumber_options):
     if renumber_options.get("renumber_figures", False):
         renumber_figures_tables(merged_doc, chapter_num)
     
+    composer = None if fast_merge else Composer(merged_doc)
+    
     # Append remaining documents
-    for i, section_data in enumerate(sections_data[1:], start=1):
+    for i, section_doc in enumerate(section_docs[1:], start=1):
         # Add page break before new section
         merged_doc.add_page_break()
         
-        # Load section document
-        section_doc = Document(io.BytesIO(section_data["file_bytes"]))
-        
         # Renumber if needed
         if renumber_options.get("renumber_headings", False):
             section_mapping = renumber_options.get("section_mapping", {})
@@ -228,68 +348,15 @@ def merge_documents(sections_data, chapter_num, images_dict, renumber_options):
         if renumber_options.get("renumber_figures", False):
             renumber_figures_tables(section_doc, chapter_num)
         
-        # Copy paragraphs
-        for para in section_doc.paragraphs:
-            new_para = merged_doc.add_paragraph()
-            new_para.style = merged_doc.styles[para.style.name] if para.style.name in [s.name for s in merged_doc.styles] else merged_doc.styles['Normal']
-            new_para.alignment = para.alignment
-            
-            # Copy paragraph formatting
-            if para.paragraph_format.space_before:
-                new_para.paragraph_format.space_before = para.paragraph_format.space_before
-            if para.paragraph_format.space_after:
-                new_para.paragraph_format.space_after = para.paragraph_format.space_after
-            if para.paragraph_format.line_spacing:
-                new_para.paragraph_format.line_spacing = para.paragraph_format.line_spacing
-            
-            for run in para.runs:
-                new_run = new_para.add_run(run.text)
-                # Copy run formatting
-                new_run.bold = run.bold
-                new_run.italic = run.italic
-                new_run.underline = run.underline
-                if run.font.size:
-                    new_run.font.size = run.font.size
-                if run.font.name:
-                    new_run.font.name = run.font.name
-                if run.font.color and run.font.color.rgb:
-                    new_run.font.color.rgb = run.font.color.rgb
-                
-                # Copy images in runs
-                drawings = run._element.findall(qn('w:drawing'))
-                if drawings:
-                    for drawing in drawings:
-                        new_run._element.append(copy.deepcopy(drawing))
+        # All appended sections inherit the base document's page setup
+        strip_section_breaks(section_doc)
         
-        # Copy tables
-        for table in section_doc.tables:
-            # Add a blank paragraph before table for spacing
-            merged_doc.add_paragraph()
-            new_table = merged_doc.add_table(rows=0, cols=len(table.columns))
-            new_table.alignment = WD_TABLE_ALIGNMENT.CENTER
-            
-            # Copy table style if available
-            try:
-                new_table.style = table.style
-            except:
-                pass
-            
-            for row in table.rows:
-                new_row = new_table.add_row()
-                for j, cell in enumerate(row.cells):
-                    if j < len(new_row.cells):
-                        new_row.cells[j].text = cell.text
-                        # Copy cell paragraph formatting
-                        for k, para in enumerate(cell.paragraphs):
-                            if k < len(new_row.cells[j].paragraphs):
-                                target_para = new_row.cells[j].paragraphs[k]
-                                target_para.alignment = para.alignment
-                                for run in target_para.runs:
-                                    if para.runs:
-                                        src_run = para.runs[0]
-                                        run.bold = src_run.bold
-                                        if src_run.font.size:
-                                            run.font.size = src_run.font.size
+        # Fast path falls back to Composer for sections with non-image parts
+        if composer is None and append_document_body(merged_doc, section_doc):
+            continue
+        if composer is None:
+            composer = Composer(merged_doc)
+        composer.append(section_doc)
     
     # Insert images at specified positions
     for img_key, img_data in images_dict.items():
@@ -306,11 +373,10 @@ def merge_documents(sections_data, chapter_num, images_dict, renumber_options):
                     )
                     break
     
-    # Save to buffer
+    # Save to buffer and hand back the bytes once; callers pass them straight to download
     buffer = io.BytesIO()
     merged_doc.save(buffer)
-    buffer.seek(0)
-    return buffer
+    return buffer.getvalue()
 
 
 # ═══════════════════════════════════════════════════════
@@ -332,6 +398,13 @@ with st.sidebar:
     renumber_headings = st.checkbox("แก้ไขหมายเลขหัวข้อ", value=True)
     renumber_figures = st.checkbox("แก้ไขหมายเลขรูปภาพ/ตาราง", value=True)
     
+    st.subheader("⚡ วิธีรวมไฟล์")
+    fast_merge = st.checkbox(
+        "โหมดรวมเร็ว (same-template)",
+        value=False,
+        help="คัดลอกเนื้อหาโดยตรงโดยไม่ผ่าน docxcompose เร็วกว่า แต่ใช้ style/รายการลำดับเลขของไฟล์แรกกับทุกไฟล์"
+    )
+    
     st.divider()
     
     st.subheader("📏 ตั้งค่าเอกสาร")
@@ -372,28 +445,30 @@ with tab1:
         # Only add NEW files (preserve existing order)
         for uf in uploaded_files:
             if uf.name not in existing_names:
-                file_bytes = uf.read()
-                uf.seek(0)
                 info = extract_docx_content(uf)
                 uf.seek(0)
                 st.session_state.sections.append({
                     "name": uf.name,
-                    "file_bytes": file_bytes,
+                    "file_path": spool_upload(uf),
+                    "file_id": uf.file_id,
                     "info": info,
                     "order": len(st.session_state.sections),
                     "enabled": True,
                     "custom_section_num": None
                 })
             else:
-                # Update file bytes for existing files
+                # Re-spool existing files only when a new upload replaced them
                 for s in st.session_state.sections:
                     if s["name"] == uf.name:
-                        file_bytes = uf.read()
-                        uf.seek(0)
-                        s["file_bytes"] = file_bytes
+                        if s.get("file_id") != uf.file_id:
+                            spool_upload(uf, s["file_path"])
+                            s["file_id"] = uf.file_id
                         break
         
         # Remove sections whose files were removed from uploader
+        for s in st.session_state.sections:
+            if s["name"] not in uploaded_names:
+                remove_spooled_file(s["file_path"])
         st.session_state.sections = [
             s for s in st.session_state.sections if s["name"] in uploaded_names
         ]
@@ -526,7 +601,7 @@ with tab3:
         for section in st.session_state.sections:
             if section.get("enabled", True) and section.get("info", {}).get("headings"):
                 for h in section["info"]["headings"]:
-                    match = re.match(r'^(\d+(?:\.\d+)*)\s*(.*)', h["text"])
+                    match = HEADING_NUM_RE.match(h["text"])
                     if match:
                         all_headings.append({
                             "original_num": match.group(1),
@@ -651,19 +726,38 @@ with tab4:
                         "section_mapping": st.session_state.get("section_mapping", {})
                     }
                     
-                    result = merge_documents(
-                        enabled_sections,
+                    # Reuse the previous result when nothing that affects the merge has changed
+                    merge_key = (
+                        tuple((s["file_path"], s["file_id"]) for s in enabled_sections),
                         chapter_num,
-                        st.session_state.images,
-                        renumber_options
+                        renumber_headings,
+                        renumber_figures,
+                        fast_merge,
+                        tuple(sorted(renumber_options["section_mapping"].items())),
+                        tuple(
+                            (k, hash(v["bytes"]), v.get("caption"), v.get("insert_after_text"), v.get("width_cm"))
+                            for k, v in sorted(active_images.items())
+                        ),
                     )
+                    if st.session_state.get("merged_key") == merge_key:
+                        result = st.session_state.merged_result
+                    else:
+                        result = merge_documents(
+                            enabled_sections,
+                            chapter_num,
+                            st.session_state.images,
+                            renumber_options,
+                            fast_merge=fast_merge
+                        )
+                        st.session_state.merged_key = merge_key
+                        st.session_state.merged_result = result
                     
                     if result:
                         st.success("✅ รวมรายงานสำเร็จ!")
                         
                         st.download_button(
                             label="📥 ดาวน์โหลดรายงาน",
-                            data=result.getvalue(),
+                            data=result,
                             file_name=output_filename,
                             mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
                             type="primary",